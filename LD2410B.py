@@ -1,353 +1,1103 @@
-import busio
-import board
-import time
-import binascii
-import gc
-
-#Standard Format from UART
-
-# Command format
-Command_head = b"\xFD\xFC\xFB\xFA"
-Command_end = b"\x04\x03\x02\x01"
-Command_mode_on = b"\xFF\x00\x01\x00"
-Command_mode_off = b"\xFE\x00"
-Parameters = b"\x61\x00"
-Parameters_head = b"\xaa"
-Factory_reset = b"\xA2\x00"
-Reset = b"\xA3\x00"
-check_distance_unit = b"\xAB\x00"
-distance_unit = b"\xAA\x00"
-sensitivity = b"\x64\x00"
-
-# Output format
-Out_head = b"\xf4\xf3\xf2\xf1"
-Out_end = b"\xf8\xf7\xf6\xf5"
-Out_data_head = b"\xaa"
-Out_data_end = b"\x55"
-
-class LD2410B:
-    
-    # Class Global Variables
-    
-    """
-    Create a class to handle data from LD2410B sensor module
-    
-
-    :param: PIN TX_pin: Define RX PIN
-            PIN RX_pin: Define TX PIN
-
-    """
-    
-    def __init__ (self,Tx_pin: pin, Rx_pin: pin) -> None:
-        self.uart = busio.UART(Tx_pin,Rx_pin, baudrate = 256000)
-        #Variables:
-        self.move_dist = None
-        self.move_sen = None
-        self.stable_dist = None
-        self.stable_sen = None
-        self.M_dist = None
-        self.target = None
-        self.W_type = None
-        self.cmd_check = 0
-    
-    """
-    Internal Function - Shifting data for data length in a correct format for command mode 
-    
-
-    :param: int cmd_size: the length for this command
-    
-    :return: bytes: 2 bytes length size
-
-    """
-    def _shifting(self,cmd_size = int) -> bytes:
-        temp = cmd_size << 8 
-        return temp.to_bytes(2,'big')
-    
-    """
-    Internal Function - Check the command format is it correct
-    
-
-    :param: str mode : checking your current operation mode (data / command)
-            str response : the full command from the module
-    
-    """    
-    
-    def _check_head_tail(self,mode, response) -> None:
-        if mode is "data":
-            head = Out_head
-            tail = Out_end
-            output = "Output"
-        elif mode is "command":
-            head = Command_head
-            tail = Command_end
-            output = "Command"
-        else:
-            raise ValueError ("Wrong head tail mode Input")
-        
-        if response[0:4] != head:
-            raise ValueError ("Wrong {} Header".format(output))
-        elif response[-4:] != tail:
-            raise ValueError ("Wrong {} End".format(output))
-        elif response[5]*256 + response[4] != len(response) - len(Out_head) - len(Out_end) - 2:
-            raise ValueError ("Missing {} data".format(output))
-
-    """
-    Check / Set your command mode status
-    
-    Check :
-    :return: int: 1 = ON / 0 = OFF
-    
-    Set :
-    
-    :param: int value: Values to set the mode. ( 1 = ON / 0 = OFF)
-    
-    """       
-    
-    @property
-    def cmd_mode(self):
-        return self.cmd_check
-    
-    @cmd_mode.setter
-    def cmd_mode(self, value):
-        if value == 1:
-            data = Command_head + self._shifting(4) +Command_mode_on + Command_end
-        elif value == 0:
-            data = Command_head + self._shifting(2) +Command_mode_off + Command_end
-        
-        result =self._send_command(data)
-        
-        if result[0] == Command_mode_on[0]:
-            print("Command Mode ON")
-            self.cmd_check = 1
-        elif result[0] == Command_mode_off[0]:
-            print("Command Mode OFF")
-            self.cmd_check = 0
-    
-    
-    """
-    Show all the setting parameters
-    Included:
-    1) Maximum Detection Range
-    2) Maximum Detection Movement Range
-    3) Maximum Detection Stable Range
-    4) Detection Movement Sensitivity
-    5) Detection Stable Sensitivity
-    6) Waiting Time
-    
-    :return: str: the whole string for all parameters
-
-    """
-    @property
-    def Parameters(self):
-        data = Command_head + self._shifting(2) + Parameters + Command_end
-        result =self._send_command(data)
-        if result[4] != int.from_bytes(Parameters_head,'big'):
-            raise ValueError("Command Word Response Error")
-        
-        string =("Maximum Detection Range: {}\n".format(result[5]) +
-                "Maxiumum Detection Movement Range: {}\n".format(result[6]) +
-                "Maxiumum Detection Stable Range: {}\n".format(result[7]))
-        for i in range(8):
-            temp = "Detection Movement Sensitivity {}: {}\n".format(i,result[8+i])
-            string += temp
-            temp = "Detection Stable Sensitivity {}: {}\n".format(i,result[17+i])
-            string += temp
-        
-        string += "Waiting Time: {}".format(result[-1]*256 + result[-2])
-        return string
-    
-    
-    """
-    Check and Set the module's Distance Unit: (0.2m / 0.75m)
-    This module has two distance unit. 0.2m and 0.75m
-    
-    This module has set into different distance unit (Unit 0 - Unit 8).
-    This function is to determine the distance between each distance units 
-
-    Check:
-    :return: str: show the current distance unit
-    
-    Set:
-    :param: str value: set 0.2m or 0.75m
-
-    """    
-    @property
-    def distance_unit(self):
-        data = Command_head + self._shifting(2) + check_distance_unit + Command_end
-        result =self._send_command(data)
-        
-        if result[-1] == 0:
-            if result[-2] == 1:
-                string = "0.2m Distance per Unit"
-            elif result[-2] == 0:
-                string = "0.75m Distance per Unit"
-            else:
-                raise ValueError ("Wrong distance Value 1")
-        else:
-            raise ValueError ("Wrong distance Value 2")
-        
-        return string
-    
-    @distance_unit.setter
-    def distance_unit(self,value):
-        if value == "0.2m":
-            dist = self._shifting(1)
-        elif value == "0.75m":
-            dist = self._shifting(0)
-        else:
-            raise ValueError ("Please choose within 0.75m and 0.2m")
-            
-        data = Command_head + self._shifting(4) + distance_unit + dist + Command_end
-        result =self._send_command(data)
-        
-        print("Module has set to {} distance unit".format(value))
-        
-    """
-    Set your sensor sensitivity for each distance unit
-    
-    :param: int unit_sen: The distance unit value (0 - 8 / all)
-            int move_sen: The sensitivity levels for movement sensors (0 - 10)
-            int stable_sen: The sensitivity levels for stable sensors (0 - 10)
-        
-    """       
-    def set_sensitivity(self,unit_sen: str, move_sen: int, stable_sen: int):
-        padding = b"\x00\x00"
-        move = b"\x01\x00"
-        stable = b"\x02\x00"
-        try:
-            unit = self._shifting(int(unit_sen))
-            
-        except ValueError as error:
-            if unit_sen is "all":
-                unit = b"\xFF\xFF"
-            else:
-                raise ValueError ("Wrong sensitivity Input")
-            
-        except Exception as error:
-            raise error
-        
-        data = Command_head + self._shifting(20) + sensitivity + padding + unit + padding
-        data = data + move + self._shifting(move_sen) + padding
-        data = data + stable + self._shifting(stable_sen) + padding + Command_end
-        
-        result =self._send_command(data)
-        
-        print ("Sensitivity has been Set!")
-        
-        
-    """
-    Factory Reset the module.
-    It changes all the settings to default
-    The settings will be activate after the modules has been reset    
-    """               
-    def factory_reset(self):
-        data = Command_head + self._shifting(2) + Factory_reset + Command_end
-        result =self._send_command(data)
-        
-        print("Module has reset to default setting! Please reset the module")
-   
-    """
-    Reset the module.
-    The module will reset itself 
-    """             
-    def reset(self):
-        data = Command_head + self._shifting(2) + Reset + Command_end
-        result =self._send_command(data)
-        
-        time.sleep(3)
-        
-        print("Module has reset!")
-    
-    """
-    Internal Function - send the all the commands and receive feedbacks confirmation from the module
-    
-
-    :param: int cmd: the command set for each command
-    
-    :return: bytes: responsed command (head and tail removed)
-
-    """        
-    def _send_command (self,cmd: str, timeout: int = 5) -> None:
-        #print(cmd)
-        self.uart.write(cmd)
-        
-        self.uart.reset_input_buffer()
-        gc.collect()
-        stamp = time.monotonic()
-        response = b""
-        while (time.monotonic() - stamp) < timeout:
-            if self.uart.in_waiting:
-                response += self.uart.read(1)
-                if Command_head in response and response[-4:] == Command_end:
-                    break
-        #print(response)
-        #print(type(response))
-        
-        self._check_head_tail("command",response)
-        if response[6] + response[7] != cmd[6] + cmd[7] + 1:
-            raise ValueError("Command Word Response Error")
-        elif response[8] + response[9] != 0:
-            raise ValueError("Command Fail")
-        
-        return response[6:-4]
-    """
-    Collect data from sensor module
-    Module will automatic send out result through UART.
-    This function will automatically collect all those data to useful information
-
-    :param: int timeout: Waiting time from UART. Default: 5 seconds 
-    
-    :return: int move_dist: Movement Object Distance - in cm
-             int move_sen: Movement Object Sensitivty (0 -100)
-             int stable_dist: Stable Object Distance - in cm
-             int stable_sen: Stable Object Sensitivty (0 -100)
-             int M_dist: Measuring distance - in cm
-
-    """     
-
-    def collect_data (self, timeout: int = 5) -> None:
-        self.uart.reset_input_buffer()
-        gc.collect()
-        stamp = time.monotonic()
-        response = b""
-        while (time.monotonic() - stamp) < timeout:
-            if self.uart.in_waiting:
-                response += self.uart.read(1)
-                if Out_head in response and response[-4:] == Out_end:
-                    break
-        #print(response)
-        
-        self._check_head_tail("data",response)
-        if response[7] != int.from_bytes(Out_data_head,'big'):
-            raise ValueError ("Wrong Output data Header")
-        elif response[-6] != int.from_bytes(Out_data_end,'big'):
-            raise ValueError ("Wrong Output data End")
-        elif response[-5] != 0:
-            raise ValueError ("Wrong checking point")
-        
-        #Checking operation Mode
-        if response[6] == 2:
-            self.W_type = "Basic Mode"
-        elif response[6] == 1:
-            self.W_type = "Engineering Mode"
-        else:
-            raise ValueError ("Wrong Working mode Data")
-        
-        #Checking target:
-        if response[8] == 0:
-            self.target = "No target"
-        elif response[8] == 1:
-            self.target = "Moving target"
-        elif response[8] == 2:
-            self.target = "Stable target"        
-        elif response[8] == 3:
-            self.target = "Both target"            
-        else:
-            raise ValueError ("Wrong Rarget Value")
-        
-        #Convert all the data
-        self.move_dist = response[10]*256 + response[9]
-        self.move_sen = response[11]
-        self.stable_dist = response[13]*256 + response[12]
-        self.stable_sen = response[14]
-        self.M_dist = response[16]*256 + response[15]
\ No newline at end of file
+import time
+import binascii
+import gc
+from array import array
+try:
+    import busio
+except ImportError: # desktop: the UART is passed in, e.g. sensor_trace.ReplayUART
+    busio = None
+
+#Standard Format from UART
+
+# Command format
+Command_head = b"\xFD\xFC\xFB\xFA"
+Command_end = b"\x04\x03\x02\x01"
+Command_mode_on = b"\xFF\x00\x01\x00"
+Command_mode_off = b"\xFE\x00"
+Parameters = b"\x61\x00"
+Parameters_head = b"\xaa"
+Factory_reset = b"\xA2\x00"
+Reset = b"\xA3\x00"
+check_distance_unit = b"\xAB\x00"
+distance_unit = b"\xAA\x00"
+sensitivity = b"\x64\x00"
+Max_gate = b"\x60\x00"
+Engineering_on = b"\x62\x00"
+Engineering_off = b"\x63\x00"
+
+# Output format
+Out_head = b"\xf4\xf3\xf2\xf1"
+Out_end = b"\xf8\xf7\xf6\xf5"
+Out_data_head = b"\xaa"
+Out_data_end = b"\x55"
+Gate_count = 9 # distance gates 0 - 8
+
+# Stream buffer
+Buffer_size = 256 # holds several report frames / command ACKs
+Frame_min = 10 # head(4) + length(2) + tail(4)
+Frame_data = 1 # kind of frame found in the stream: report frame
+Frame_command = 2 # kind of frame found in the stream: command ACK
+
+# Target state codes
+Target_none = 0
+Target_moving = 1
+Target_stable = 2
+Target_both = 3
+Target_names = ("No target", "Moving target", "Stable target", "Both target")
+
+# Working mode codes
+Mode_engineering = 1
+Mode_basic = 2
+Mode_names = (None, "Engineering Mode", "Basic Mode")
+
+class Reading:
+    
+    """
+    Compact record for one report frame from the module
+    
+
+    :param: int target: Target state code (Target_none / Target_moving / Target_stable / Target_both)
+            int mode: Working mode code (Mode_engineering / Mode_basic)
+            int move_dist: Movement Object Distance - in cm
+            int move_sen: Movement Object Sensitivty (0 -100)
+            int stable_dist: Stable Object Distance - in cm
+            int stable_sen: Stable Object Sensitivty (0 -100)
+            int M_dist: Measuring distance - in cm
+
+    """
+    
+    __slots__ = ("target", "mode", "move_dist", "move_sen", "stable_dist", "stable_sen", "M_dist")
+    
+    def __init__ (self, target = None, mode = None, move_dist = None, move_sen = None,
+                  stable_dist = None, stable_sen = None, M_dist = None) -> None:
+        self.target = target
+        self.mode = mode
+        self.move_dist = move_dist
+        self.move_sen = move_sen
+        self.stable_dist = stable_dist
+        self.stable_sen = stable_sen
+        self.M_dist = M_dist
+    
+    """
+    Copy this reading, e.g. to keep it after the driver has decoded the next frame
+    
+    :return: Reading: a new record with the same values
+
+    """
+    
+    def copy (self):
+        return Reading(self.target, self.mode, self.move_dist, self.move_sen,
+                       self.stable_dist, self.stable_sen, self.M_dist)
+    
+    """
+    Target state / Working mode as text
+    
+    :return: str: e.g. "Both target" / "Basic Mode" (None before the first frame)
+
+    """
+    
+    @property
+    def target_name (self):
+        if self.target is None:
+            return None
+        return Target_names[self.target]
+    
+    @property
+    def mode_name (self):
+        if self.mode is None:
+            return None
+        return Mode_names[self.mode]
+
+class Params:
+    
+    """
+    Parsed setting parameters of the module
+    
+
+    :param: bytes result: the response of the Parameters command (head and tail removed)
+    
+    Attributes:
+            int max_range: Maximum Detection Range (distance units)
+            int move_gate: Maximum Detection Movement Range
+            int stable_gate: Maximum Detection Stable Range
+            array move_sen: Detection Movement Sensitivity of distance unit 0 - 8
+            array stable_sen: Detection Stable Sensitivity of distance unit 0 - 8
+            int waiting: Waiting Time in seconds
+
+    """
+    
+    __slots__ = ("max_range", "move_gate", "stable_gate", "move_sen", "stable_sen", "waiting")
+    
+    def __init__ (self, result: bytes) -> None:
+        if result[4] != Parameters_head[0]:
+            raise ValueError("Command Word Response Error")
+        self.max_range = result[5]
+        self.move_gate = result[6]
+        self.stable_gate = result[7]
+        self.move_sen = array('B', result[8:8 + Gate_count])
+        self.stable_sen = array('B', result[17:17 + Gate_count])
+        self.waiting = result[-1]*256 + result[-2]
+    
+    def __str__ (self) -> str:
+        string =("Maximum Detection Range: {}\n".format(self.max_range) +
+                "Maxiumum Detection Movement Range: {}\n".format(self.move_gate) +
+                "Maxiumum Detection Stable Range: {}\n".format(self.stable_gate))
+        for i in range(Gate_count):
+            temp = "Detection Movement Sensitivity {}: {}\n".format(i,self.move_sen[i])
+            string += temp
+            temp = "Detection Stable Sensitivity {}: {}\n".format(i,self.stable_sen[i])
+            string += temp
+        
+        string += "Waiting Time: {}".format(self.waiting)
+        return string
+
+class _Command:
+    
+    """
+    Internal - one command queued in the non-blocking command engine
+    
+    """
+    
+    __slots__ = ("cmd", "callback", "timeout", "retries", "pipeline", "stamp")
+    
+    def __init__ (self, cmd: bytes, callback, timeout: int, retries: int, pipeline: bool) -> None:
+        self.cmd = cmd
+        self.callback = callback
+        self.timeout = timeout
+        self.retries = retries
+        self.pipeline = pipeline
+        self.stamp = None # time sent, None = still waiting in the queue
+
+class LD2410B:
+    
+    # Class Global Variables
+    
+    """
+    Create a class to handle data from LD2410B sensor module
+    
+
+    :param: PIN TX_pin: Define RX PIN
+            PIN RX_pin: Define TX PIN
+            int gc_every: Run gc.collect() every N decoded frames. Default: 0 (off)
+            int gc_threshold: Run gc.collect() when gc.mem_free() drops below this many bytes. Default: 0 (off)
+            uart: UART to use instead of opening one on the pins, e.g. sensor_trace.Recorder / sensor_trace.ReplayUART. Default: None
+            
+    With both policies off, garbage collection is left to the VM.
+    The frame path does not allocate in steady state, so it rarely triggers one.
+
+    """
+    
+    def __init__ (self,Tx_pin: "pin", Rx_pin: "pin", gc_every: int = 0, gc_threshold: int = 0, uart = None) -> None:
+        if uart is None:
+            uart = busio.UART(Tx_pin,Rx_pin, baudrate = 256000, receiver_buffer_size = Buffer_size)
+        self.uart = uart
+        #Variables:
+        self.reading = Reading() # updated in place by every decoded frame
+        self.frames = 0 # number of decoded frames, changes when reading is new
+        self.cmd_check = 0
+        self.eng_check = 0
+        self._params = None # cached Params, None = read again from the module
+        self._commands = [] # command engine queue, commands in flight first
+        #Engineering Mode: per gate energy (0 -100), only the first move_gates / stable_gates are valid
+        self.move_energy = array('B', bytes(Gate_count))
+        self.stable_energy = array('B', bytes(Gate_count))
+        self.move_gates = 0
+        self.stable_gates = 0
+        self.light = None
+        self.out_pin = None
+        #Stream buffer: UART bytes are drained in bulk into here and parsed in place
+        self._buf = bytearray(Buffer_size)
+        self._view = memoryview(self._buf)
+        self._tails = [None] * Buffer_size # views from each write position to the end, made once on first use
+        self._scan = 0 # first unparsed byte - bytes before it hold no frame head
+        self._need = 0 # no complete frame can exist before the data reaches here
+        self._len = 0 # end of received data
+        self._frame_start = 0 # position of the frame found by _next_frame
+        self._frame_end = 0
+        self._last_start = -1 # position of the newest report frame found by _parse_all
+        self._last_end = 0
+        #Garbage collection policy:
+        self.gc_every = gc_every
+        self.gc_threshold = gc_threshold
+        self._gc_count = 0
+    
+    """
+    Internal Function - Shifting data for data length in a correct format for command mode 
+    
+
+    :param: int cmd_size: the length for this command
+    
+    :return: bytes: 2 bytes length size
+
+    """
+    def _shifting(self,cmd_size = int) -> bytes:
+        temp = cmd_size << 8 
+        return temp.to_bytes(2,'big')
+    
+    """
+    Internal Function - Check whether the bytes at a position of the stream buffer match a pattern
+    
+
+    :param: int pos: position in the stream buffer
+            bytes pattern: the head / tail to be compared
+    
+    :return: bool: True if matched
+
+    """
+    
+    def _match(self, pos: int, pattern: bytes) -> bool:
+        buf = self._buf
+        i = 0
+        count = len(pattern)
+        while i < count:
+            if buf[pos + i] != pattern[i]:
+                return False
+            i += 1
+        return True
+    
+    """
+    Internal Function - Drain everything waiting on the UART into the stream buffer
+    The unparsed data is moved to the front of the buffer only when the free space runs out
+    Nothing is allocated once the view for each write position exists: the UART reads
+    into the cached tail view with a byte limit and the data is moved index by index
+    
+
+    :return: int: number of bytes read
+
+    """
+    
+    def _fill(self) -> int:
+        waiting = self.uart.in_waiting
+        if not waiting:
+            return 0
+        if self._len + waiting > Buffer_size and self._scan:
+            buf = self._buf
+            scan = self._scan
+            remain = self._len - scan
+            i = 0
+            while i < remain:
+                buf[i] = buf[scan + i]
+                i += 1
+            self._need -= scan
+            self._len = remain
+            self._scan = 0
+        if self._len == Buffer_size:
+            # Full of bytes without any complete frame - drop them and resynchronise
+            self._scan = self._len = self._need = 0
+        space = Buffer_size - self._len
+        if waiting > space:
+            waiting = space
+        tail = self._tails[self._len]
+        if tail is None:
+            tail = self._tails[self._len] = self._view[self._len:]
+        count = self.uart.readinto(tail, waiting)
+        if count:
+            self._len += count
+            return count
+        return 0
+    
+    """
+    Internal Function - Locate the next complete frame in the stream buffer
+    Bytes are scanned once: the scan position is kept between calls and
+    the tail is checked at the position given by the length field
+    
+
+    :return: int: Frame_data / Frame_command / 0 if no complete frame yet
+    
+    The frame position is left in _frame_start / _frame_end
+
+    """
+    
+    def _next_frame(self) -> int:
+        buf = self._buf
+        pos = self._scan
+        if self._len - pos < Frame_min:
+            # checked first so that last is never negative: no int object on CPython either
+            self._need = pos + Frame_min
+            return 0
+        last = self._len - Frame_min
+        while pos <= last:
+            first = buf[pos]
+            if first == Out_head[0] and self._match(pos, Out_head):
+                kind = Frame_data
+                tail = Out_end
+            elif first == Command_head[0] and self._match(pos, Command_head):
+                kind = Frame_command
+                tail = Command_end
+            else:
+                pos += 1
+                continue
+            end = pos + Frame_min + buf[pos + 5]*256 + buf[pos + 4]
+            if end - pos > Buffer_size:
+                pos += 1 # impossible length - not a real head
+                continue
+            # a frame running past the end of the buffer is moved to the front by _fill
+            if end > self._len:
+                self._scan = pos
+                self._need = end # wait for the rest of this frame
+                return 0
+            if not self._match(end - 4, tail):
+                pos += 1
+                continue
+            self._scan = pos
+            self._frame_start = pos
+            self._frame_end = end
+            return kind
+        self._scan = pos
+        self._need = pos + Frame_min
+        return 0
+    
+    """
+    Internal Function - Release the stream buffer up to the end of a parsed frame
+    
+
+    :param: int end: end of the parsed frame
+
+    """
+    
+    def _consume(self, end: int) -> None:
+        if end >= self._len:
+            self._scan = self._len = 0
+        else:
+            self._scan = end
+        self._need = 0
+    
+    """
+    Internal Function - Discard everything received so far (UART and stream buffer)
+    
+    """
+    
+    def _flush(self) -> None:
+        self.uart.reset_input_buffer()
+        self._scan = self._len = self._need = 0
+    
+    """
+    Check / Set your command mode status
+    
+    Check :
+    :return: int: 1 = ON / 0 = OFF
+    
+    Set :
+    
+    :param: int value: Values to set the mode. ( 1 = ON / 0 = OFF)
+    
+    """       
+    
+    @property
+    def cmd_mode(self):
+        return self.cmd_check
+    
+    @cmd_mode.setter
+    def cmd_mode(self, value):
+        result =self._send_command(self._mode_command(value))
+        self._mode_done(result)
+    
+    """
+    Internal Function - Build the command to switch the command mode
+    
+
+    :param: int value: 1 = ON / 0 = OFF
+    
+    :return: bytes: the full command
+
+    """
+    
+    def _mode_command(self, value: int) -> bytes:
+        if value == 1:
+            return Command_head + self._shifting(4) +Command_mode_on + Command_end
+        elif value == 0:
+            return Command_head + self._shifting(2) +Command_mode_off + Command_end
+        raise ValueError ("Please choose within 1 and 0")
+    
+    """
+    Internal Function - Update the command mode status from its ACK (also used as engine callback)
+    
+
+    :param: bytes result: responsed command (None = no response)
+
+    """
+    
+    def _mode_done(self, result) -> None:
+        if result is None:
+            return
+        if result[0] == Command_mode_on[0]:
+            print("Command Mode ON")
+            self.cmd_check = 1
+        elif result[0] == Command_mode_off[0]:
+            print("Command Mode OFF")
+            self.cmd_check = 0
+    
+    """
+    Check / Set the Engineering Mode status
+    In Engineering Mode the module also reports the energy of every distance gate.
+    Command mode has to be ON to change it
+    
+    Check :
+    :return: int: 1 = ON / 0 = OFF
+    
+    Set :
+    
+    :param: int value: Values to set the mode. ( 1 = ON / 0 = OFF)
+    
+    """
+    
+    @property
+    def engineering_mode(self):
+        return self.eng_check
+    
+    @engineering_mode.setter
+    def engineering_mode(self, value):
+        if value == 1:
+            data = Command_head + self._shifting(2) + Engineering_on + Command_end
+        elif value == 0:
+            data = Command_head + self._shifting(2) + Engineering_off + Command_end
+        else:
+            raise ValueError ("Please choose within 1 and 0")
+        
+        result =self._send_command(data)
+        
+        if result[0] == Engineering_on[0]:
+            print("Engineering Mode ON")
+            self.eng_check = 1
+        elif result[0] == Engineering_off[0]:
+            print("Engineering Mode OFF")
+            self.eng_check = 0
+    
+    
+    """
+    Show all the setting parameters
+    Included:
+    1) Maximum Detection Range
+    2) Maximum Detection Movement Range
+    3) Maximum Detection Stable Range
+    4) Detection Movement Sensitivity
+    5) Detection Stable Sensitivity
+    6) Waiting Time
+    
+    :return: str: the whole string for all parameters
+
+    """
+    @property
+    def Parameters(self):
+        return str(self.parameters)
+    
+    """
+    All the setting parameters as a Params object
+    The module is only asked the first time. The copy is kept until a setting is changed,
+    the module is reset or refresh_parameters() is called
+    
+    :return: Params: cached parameters
+
+    """
+    
+    @property
+    def parameters(self):
+        if self._params is None:
+            self.refresh_parameters()
+        return self._params
+    
+    """
+    Read all the setting parameters from the module again (Command mode has to be ON)
+    
+    :return: Params: the new parameters
+
+    """
+    
+    def refresh_parameters(self):
+        result =self._send_command(Command_head + self._shifting(2) + Parameters + Command_end)
+        self._params = Params(result)
+        return self._params
+    
+    """
+    Check and Set the module's Distance Unit: (0.2m / 0.75m)
+    This module has two distance unit. 0.2m and 0.75m
+    
+    This module has set into different distance unit (Unit 0 - Unit 8).
+    This function is to determine the distance between each distance units 
+
+    Check:
+    :return: str: show the current distance unit
+    
+    Set:
+    :param: str value: set 0.2m or 0.75m
+
+    """    
+    @property
+    def distance_unit(self):
+        data = Command_head + self._shifting(2) + check_distance_unit + Command_end
+        result =self._send_command(data)
+        
+        if result[-1] == 0:
+            if result[-2] == 1:
+                string = "0.2m Distance per Unit"
+            elif result[-2] == 0:
+                string = "0.75m Distance per Unit"
+            else:
+                raise ValueError ("Wrong distance Value 1")
+        else:
+            raise ValueError ("Wrong distance Value 2")
+        
+        return string
+    
+    @distance_unit.setter
+    def distance_unit(self,value):
+        if value == "0.2m":
+            dist = self._shifting(1)
+        elif value == "0.75m":
+            dist = self._shifting(0)
+        else:
+            raise ValueError ("Please choose within 0.75m and 0.2m")
+            
+        data = Command_head + self._shifting(4) + distance_unit + dist + Command_end
+        self._params = None
+        result =self._send_command(data)
+        
+        print("Module has set to {} distance unit".format(value))
+        
+    """
+    Set your sensor sensitivity for each distance unit
+    
+    :param: int unit_sen: The distance unit value (0 - 8 / all)
+            int move_sen: The sensitivity levels for movement sensors (0 - 10)
+            int stable_sen: The sensitivity levels for stable sensors (0 - 10)
+        
+    """       
+    def set_sensitivity(self,unit_sen: str, move_sen: int, stable_sen: int):
+        try:
+            unit = self._shifting(int(unit_sen))
+            
+        except ValueError as error:
+            if unit_sen == "all":
+                unit = b"\xFF\xFF"
+            else:
+                raise ValueError ("Wrong sensitivity Input")
+            
+        except Exception as error:
+            raise error
+        
+        data = self._sensitivity_command(unit, move_sen, stable_sen)
+        self._params = None
+        result =self._send_command(data)
+        
+        print ("Sensitivity has been Set!")
+    
+    """
+    Internal Function - Build the sensitivity command for one distance unit
+    
+
+    :param: bytes unit: 2 bytes distance unit (b"\xFF\xFF" = all)
+            int move_sen: The sensitivity levels for movement sensors
+            int stable_sen: The sensitivity levels for stable sensors
+    
+    :return: bytes: the full command
+
+    """
+    
+    def _sensitivity_command(self, unit: bytes, move_sen: int, stable_sen: int) -> bytes:
+        padding = b"\x00\x00"
+        move = b"\x01\x00"
+        stable = b"\x02\x00"
+        data = Command_head + self._shifting(20) + sensitivity + padding + unit + padding
+        data = data + move + self._shifting(move_sen) + padding
+        data = data + stable + self._shifting(stable_sen) + padding + Command_end
+        return data
+    
+    """
+    Internal Function - Build the command for the maximum distance units and the waiting time
+    
+
+    :param: int move_gate: Maximum Detection Movement Range (2 - 8)
+            int stable_gate: Maximum Detection Stable Range (2 - 8)
+            int waiting: Waiting Time (unmanned duration) in seconds
+    
+    :return: bytes: the full command
+
+    """
+    
+    def _max_gate_command(self, move_gate: int, stable_gate: int, waiting: int) -> bytes:
+        padding = b"\x00\x00"
+        data = Command_head + self._shifting(20) + Max_gate
+        data = data + b"\x00\x00" + self._shifting(move_gate) + padding
+        data = data + b"\x01\x00" + self._shifting(stable_gate) + padding
+        data = data + b"\x02\x00" + waiting.to_bytes(2, 'little') + padding + Command_end
+        return data
+    
+    """
+    Apply a full parameter profile in one command mode session
+    The cached parameters (read once if needed) are compared and only the settings that differ are sent.
+    The commands are pipelined: they are written back to back and their ACKs are matched afterwards
+    
+    :param: dict profile: any of
+                int "move_gate": Maximum Detection Movement Range (2 - 8)
+                int "stable_gate": Maximum Detection Stable Range (2 - 8)
+                list "move": Movement Sensitivity for distance unit 0 - 8 (0 - 100)
+                list "stable": Stable Sensitivity for distance unit 0 - 8 (0 - 100)
+                int "waiting": Waiting Time (unmanned duration) in seconds
+            int timeout: Waiting time for each ACK. Default: 5 seconds
+            bool blocking: Wait until the profile is applied. Default: True
+                           If False, the commands are only queued and poll() has to be called
+                           until busy is False
+    
+    :return: int: number of commands sent (None if not blocking)
+
+    """
+    
+    def configure(self, profile: dict, timeout: int = 5, blocking: bool = True) -> int:
+        count = [] # number of setting commands, known once the parameters have been compared
+        results = []
+        session = self.cmd_check == 0
+        if session:
+            self.queue_command(self._mode_command(1), self._mode_done, timeout)
+        
+        def compare(result):
+            if result is not None and result[2] + result[3] == 0 and result[4] == Parameters_head[0]:
+                self._params = Params(result)
+            if self._params is None:
+                count.append(None) # parameters could not be read
+            else:
+                cmds = self._profile_commands(profile, self._params)
+                if cmds:
+                    self._params = None
+                for cmd in cmds:
+                    self.queue_command(cmd, results.append, timeout, pipeline = True)
+                count.append(len(cmds))
+            if session:
+                self.queue_command(self._mode_command(0), self._mode_done, timeout)
+        
+        if self._params is None:
+            self.queue_command(Command_head + self._shifting(2) + Parameters + Command_end, compare, timeout)
+        else:
+            compare(None)
+        
+        if not blocking:
+            return None
+        while self._commands:
+            self.poll()
+        
+        if count[0] is None:
+            raise ValueError ("No Command response")
+        for result in results:
+            if result is None or result[2] + result[3] != 0:
+                raise ValueError("Command Fail")
+        
+        print ("Profile has been Set! ({} commands)".format(count[0]))
+        return count[0]
+    
+    """
+    Internal Function - Build the commands for the settings of a profile that differ from the current parameters
+    
+
+    :param: dict profile: see configure()
+            Params current: the current parameters
+    
+    :return: list: the full commands
+
+    """
+    
+    def _profile_commands(self, profile: dict, current) -> list:
+        cmds = []
+        move_gate = profile.get("move_gate", current.move_gate)
+        stable_gate = profile.get("stable_gate", current.stable_gate)
+        waiting = profile.get("waiting", current.waiting)
+        if (move_gate != current.move_gate or stable_gate != current.stable_gate
+                or waiting != current.waiting):
+            cmds.append(self._max_gate_command(move_gate, stable_gate, waiting))
+        
+        move = profile.get("move")
+        stable = profile.get("stable")
+        for i in range(Gate_count):
+            move_sen = move[i] if move is not None and i < len(move) else current.move_sen[i]
+            stable_sen = stable[i] if stable is not None and i < len(stable) else current.stable_sen[i]
+            if move_sen != current.move_sen[i] or stable_sen != current.stable_sen[i]:
+                cmds.append(self._sensitivity_command(self._shifting(i), move_sen, stable_sen))
+        return cmds
+        
+        
+    """
+    Factory Reset the module.
+    It changes all the settings to default
+    The settings will be activate after the modules has been reset    
+    """               
+    def factory_reset(self):
+        data = Command_head + self._shifting(2) + Factory_reset + Command_end
+        self._params = None
+        result =self._send_command(data)
+        
+        print("Module has reset to default setting! Please reset the module")
+   
+    """
+    Reset the module.
+    The module will reset itself 
+    """             
+    def reset(self):
+        data = Command_head + self._shifting(2) + Reset + Command_end
+        self._params = None
+        result =self._send_command(data)
+        
+        time.sleep(3)
+        
+        print("Module has reset!")
+    
+    """
+    Internal Function - send the all the commands and receive feedbacks confirmation from the module
+    The command goes through the command engine queue, this call blocks until it is done
+    
+
+    :param: int cmd: the command set for each command
+    
+    :return: bytes: responsed command (head and tail removed)
+
+    """        
+    def _send_command (self,cmd: str, timeout: int = 5) -> None:
+        #print(cmd)
+        done = []
+        self.queue_command(cmd, done.append, timeout)
+        while not done:
+            self.poll()
+        
+        response = done[0]
+        if response is None:
+            raise ValueError ("No Command response")
+        elif response[2] + response[3] != 0:
+            raise ValueError("Command Fail")
+        
+        return response
+    
+    """
+    Queue a command in the non-blocking command engine.
+    poll() sends it, matches its ACK by command word and calls the callback,
+    so the main loop keeps running while the module is being configured
+    
+
+    :param: bytes cmd: the full command
+            callable callback: called with the responsed command (head and tail removed, [2:4] = status, 0 = success)
+                               or None when every try has timed out. It must not block. Default: None
+            int timeout: Waiting time for the ACK of each try. Default: 5 seconds
+            int retries: How many times the command is sent again after a timeout. Default: 0
+            bool pipeline: Send it without waiting for the ACKs of the pipelined commands before it. Default: False
+
+    """
+    
+    def queue_command (self, cmd: bytes, callback = None, timeout: int = 5, retries: int = 0,
+                       pipeline: bool = False) -> None:
+        self._commands.append(_Command(cmd, callback, timeout, retries, pipeline))
+    
+    """
+    Check if the command engine still has commands queued or waiting for their ACK
+    
+    :return: bool: True if busy
+
+    """
+    
+    @property
+    def busy (self) -> bool:
+        return len(self._commands) > 0
+    
+    """
+    Service the module without blocking: read the UART, match ACKs, retry / time out
+    and send the queued commands. The latest report frame is decoded into reading.
+    Call it from the main loop
+    
+    :return: int: number of commands still queued or in flight
+
+    """
+    
+    def poll (self) -> int:
+        self._fill()
+        if self._parse_all():
+            self._decode(self._last_start, self._last_end)
+        if self._commands:
+            self._service_commands()
+        return len(self._commands)
+    
+    """
+    Internal Function - Time out / retry the commands in flight and send the next queued ones
+    
+    """
+    
+    def _service_commands (self) -> None:
+        commands = self._commands
+        now = time.monotonic()
+        i = 0
+        while i < len(commands):
+            command = commands[i]
+            if command.stamp is None:
+                break
+            if now - command.stamp >= command.timeout:
+                if command.retries > 0:
+                    command.retries -= 1
+                    command.stamp = now
+                    self.uart.write(command.cmd)
+                else:
+                    commands.pop(i)
+                    if command.callback is not None:
+                        command.callback(None)
+                    continue
+            i += 1
+        
+        in_flight = 0
+        pipelined = True
+        for command in commands:
+            if command.stamp is None:
+                if in_flight and not (pipelined and command.pipeline):
+                    break
+                command.stamp = now
+                self.uart.write(command.cmd)
+            in_flight += 1
+            pipelined = pipelined and command.pipeline
+    
+    """
+    Internal Function - Hand an ACK from the stream buffer to the command in flight with the same command word
+    ACKs nobody waits for are dropped
+    
+
+    :param: int start: frame start in the stream buffer
+            int end: frame end in the stream buffer
+
+    """
+    
+    def _on_ack (self, start: int, end: int) -> None:
+        buf = self._buf
+        commands = self._commands
+        for i in range(len(commands)):
+            command = commands[i]
+            if command.stamp is None:
+                return
+            if buf[start + 6] == command.cmd[6] and buf[start + 7] == command.cmd[7] + 1:
+                commands.pop(i)
+                if command.callback is not None:
+                    command.callback(bytes(self._view[start + 6:end - 4]))
+                return
+    
+    """
+    Internal Function - Parse every complete frame in the stream buffer
+    The frames are consumed. ACKs go to the command engine, decoding report frames is left to the caller
+    
+    :param: list frames: if given, every report frame is decoded and appended as a Reading
+    
+    :return: bool: True if a report frame was found. Its position is left in _last_start / _last_end
+
+    """
+    
+    def _parse_all(self, frames = None) -> bool:
+        self._last_start = -1
+        while self._len >= self._need:
+            found = self._next_frame()
+            if not found:
+                break
+            self._consume(self._frame_end)
+            if found == Frame_command:
+                self._on_ack(self._frame_start, self._frame_end)
+            elif found == Frame_data:
+                if frames is not None:
+                    self._decode(self._frame_start, self._frame_end)
+                    frames.append(self.reading.copy())
+                self._last_start = self._frame_start
+                self._last_end = self._frame_end
+        return self._last_start >= 0
+    
+    """
+    Collect data from sensor module
+    Module will automatic send out result through UART.
+    This function will automatically collect all those data to useful information
+    
+    By default the UART stream is kept between calls and the most recent complete
+    frame is returned straight away. It only waits when no frame has arrived since the last call.
+
+    :param: int timeout: Waiting time from UART. Default: 5 seconds 
+            bool fresh: Discard everything received before this call and wait for a new frame. Default: False
+    
+    :return: Reading: the latest reading (the same record is updated in place by every call)
+    
+    The latest values are also available as attributes:
+             int move_dist: Movement Object Distance - in cm
+             int move_sen: Movement Object Sensitivty (0 -100)
+             int stable_dist: Stable Object Distance - in cm
+             int stable_sen: Stable Object Sensitivty (0 -100)
+             int M_dist: Measuring distance - in cm
+             str target / W_type: Target state / Working mode as text
+             
+             Engineering Mode only:
+             array move_energy: Movement energy of each distance gate (0 -100), move_gates values are valid
+             array stable_energy: Stable energy of each distance gate (0 -100), stable_gates values are valid
+
+    """     
+
+    def collect_data (self, timeout: int = 5, fresh: bool = False) -> Reading:
+        if fresh:
+            self._flush()
+        if self._commands:
+            self._service_commands()
+        stamp = time.monotonic()
+        found = False
+        while True:
+            filled = self._fill()
+            if self._parse_all():
+                # Decode before the next fill can overwrite the frame
+                self._decode(self._last_start, self._last_end)
+                found = True
+            if found and not filled:
+                return self.reading
+            # Checked on every pass: a UART delivering only garbage never runs dry
+            if (time.monotonic() - stamp) >= timeout:
+                if found:
+                    return self.reading
+                raise ValueError ("No Output data received")
+    
+    """
+    Collect every frame received since the last call
+    The attributes are updated to the most recent frame
+    
+    :param: int timeout: Waiting time from UART if no frame has arrived yet. Default: 0 (no waiting)
+    
+    :return: list: a Reading for each frame, oldest first
+
+    """
+    
+    def collect_all (self, timeout: int = 0) -> list:
+        frames = []
+        stamp = time.monotonic()
+        while True:
+            filled = self._fill()
+            self._parse_all(frames)
+            if frames and not filled:
+                return frames
+            if (time.monotonic() - stamp) >= timeout:
+                return frames
+    
+    """
+    The latest reading as attributes, kept for existing code
+    target and W_type are derived from the numeric codes when they are read
+    
+    """
+    
+    @property
+    def target(self):
+        return self.reading.target_name
+    
+    @property
+    def W_type(self):
+        return self.reading.mode_name
+    
+    @property
+    def move_dist(self):
+        return self.reading.move_dist
+    
+    @property
+    def move_sen(self):
+        return self.reading.move_sen
+    
+    @property
+    def stable_dist(self):
+        return self.reading.stable_dist
+    
+    @property
+    def stable_sen(self):
+        return self.reading.stable_sen
+    
+    @property
+    def M_dist(self):
+        return self.reading.M_dist
+    
+    """
+    Internal Function - Decode a report frame from the stream buffer into the attributes
+    
+
+    :param: int start: frame start in the stream buffer
+            int end: frame end in the stream buffer
+
+    """
+    
+    def _decode (self, start: int, end: int) -> None:
+        # Index the stream buffer directly - no slice or memoryview per frame
+        response = self._buf
+        s = start
+        
+        if response[s + 7] != Out_data_head[0]:
+            raise ValueError ("Wrong Output data Header")
+        elif response[end - 6] != Out_data_end[0]:
+            raise ValueError ("Wrong Output data End")
+        elif response[end - 5] != 0:
+            raise ValueError ("Wrong checking point")
+        
+        #Checking operation Mode
+        mode = response[s + 6]
+        if mode == Mode_basic:
+            self.move_gates = 0
+            self.stable_gates = 0
+        elif mode == Mode_engineering:
+            self._decode_gates(s, end)
+        else:
+            raise ValueError ("Wrong Working mode Data")
+        
+        #Checking target:
+        target = response[s + 8]
+        if target > Target_both:
+            raise ValueError ("Wrong Rarget Value")
+        
+        #Convert all the data
+        reading = self.reading
+        reading.mode = mode
+        reading.target = target
+        reading.move_dist = response[s + 10]*256 + response[s + 9]
+        reading.move_sen = response[s + 11]
+        reading.stable_dist = response[s + 13]*256 + response[s + 12]
+        reading.stable_sen = response[s + 14]
+        reading.M_dist = response[s + 16]*256 + response[s + 15]
+        self.frames += 1
+        
+        self._gc_policy()
+    
+    """
+    Internal Function - Decode the per gate energy of an Engineering Mode frame
+    The values are copied into the preallocated arrays, no object is created per gate
+    
+
+    :param: int s: frame start in the stream buffer
+            int end: frame end in the stream buffer
+
+    """
+    
+    def _decode_gates (self, s: int, end: int) -> None:
+        response = self._buf
+        move_gates = response[s + 17] + 1
+        stable_gates = response[s + 18] + 1
+        pos = s + 19
+        extra = end - 6 - (pos + move_gates + stable_gates)
+        if move_gates > Gate_count or stable_gates > Gate_count or extra < 0:
+            raise ValueError ("Wrong Gate number")
+        
+        energy = self.move_energy
+        i = 0
+        while i < move_gates:
+            energy[i] = response[pos + i]
+            i += 1
+        pos += move_gates
+        energy = self.stable_energy
+        i = 0
+        while i < stable_gates:
+            energy[i] = response[pos + i]
+            i += 1
+        pos += stable_gates
+        self.move_gates = move_gates
+        self.stable_gates = stable_gates
+        
+        #Additional data: light sensor value and OUT pin state
+        if extra >= 2:
+            self.light = response[pos]
+            self.out_pin = response[pos + 1]
+    
+    """
+    Internal Function - Run the garbage collector when the configured policy asks for it
+    
+    """
+    
+    def _gc_policy (self) -> None:
+        if self.gc_every:
+            self._gc_count += 1
+            if self._gc_count >= self.gc_every:
+                self._gc_count = 0
+                gc.collect()
+                return
+        if self.gc_threshold and gc.mem_free() < self.gc_threshold:
+            gc.collect()
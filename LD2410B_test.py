@@ -0,0 +1,158 @@
+import time
+import random
+import struct
+import LD2410B
+
+#Desktop check of the LD2410B stream parser (python LD2410B_test.py, or pytest)
+#Basic and engineering report frames, with command ACKs in between, are cut in random
+#UART chunks and fed one chunk per collect_all() call: every frame must come out, in order
+#A UART sending only garbage must not keep collect_data() / collect_all() past their timeout
+
+class ChunkUART:
+
+    """
+    UART stand-in: the test puts bytes in, the driver reads them
+
+    """
+
+    def __init__ (self) -> None:
+        self.rx = bytearray()
+
+    @property
+    def in_waiting (self) -> int:
+        return len(self.rx)
+
+    def readinto (self, buf, nbytes: int = None) -> int:
+        count = min(len(buf) if nbytes is None else nbytes, len(self.rx))
+        buf[:count] = self.rx[:count]
+        del self.rx[:count]
+        return count
+
+    def write (self, data) -> int:
+        return len(data)
+
+    def reset_input_buffer (self) -> None:
+        self.rx = bytearray()
+
+"""
+Build a report frame
+
+:param: int dist: moving / stable distance in cm, also used as a marker of the frame
+        bool engineering: engineering mode frame (gate energies, light, OUT pin)
+
+:return: bytes: frame
+
+"""
+
+def report_frame (dist: int, engineering: bool) -> bytes:
+    mode = LD2410B.Mode_engineering if engineering else LD2410B.Mode_basic
+    data = bytes((mode, LD2410B.Out_data_head[0], LD2410B.Target_both,
+                  dist & 0xFF, dist >> 8, 50, dist & 0xFF, dist >> 8, 40, 0, 0))
+    if engineering:
+        gates = LD2410B.Gate_count
+        data += bytes((gates - 1, gates - 1)) + bytes(range(gates)) + bytes(range(gates)) + bytes((120, 1))
+    data += bytes((LD2410B.Out_data_end[0], 0))
+    return LD2410B.Out_head + struct.pack("<H", len(data)) + data + LD2410B.Out_end
+
+"""
+Parameters ACK (38 bytes), not answering any command of the driver
+
+"""
+
+def ack_frame () -> bytes:
+    data = bytes((0x61, 0x01, 0x00, 0x00, 0xAA, 0x08, 0x08, 0x08)) + bytes(18) + bytes((5, 0))
+    return LD2410B.Command_head + struct.pack("<H", len(data)) + data + LD2410B.Command_end
+
+"""
+Feed a stream in chunks and check the decoded distances
+
+:param: int seed: random seed
+        int low / high: chunk size range in bytes
+        float engineering: share of engineering frames (0 - 1)
+
+:return: tuple: (frames sent, frames decoded)
+
+"""
+
+def run (seed: int, low: int, high: int, engineering: float) -> tuple:
+    rnd = random.Random(seed)
+    stream = bytearray()
+    sent = []
+    for i in range(3000):
+        dist = 100 + i % 500
+        stream += report_frame(dist, rnd.random() < engineering)
+        sent.append(dist)
+        if rnd.random() < 0.05:
+            stream += ack_frame()
+    uart = ChunkUART()
+    sensor = LD2410B.LD2410B(None, None, uart = uart)
+    got = []
+    pos = 0
+    while pos < len(stream):
+        size = rnd.randint(low, high)
+        uart.rx += stream[pos:pos + size]
+        pos += size
+        got += [reading.move_dist for reading in sensor.collect_all()]
+    #every decoded frame must be one that was sent, in order (a lost frame is counted, not an error here)
+    i = 0
+    for dist in got:
+        while i < len(sent) and sent[i] != dist:
+            i += 1
+        assert i < len(sent), "frames out of order or corrupted"
+        i += 1
+    return len(sent), len(got)
+
+class GarbageUART (ChunkUART):
+
+    """
+    UART that never runs dry and never sends a frame
+
+    """
+
+    @property
+    def in_waiting (self) -> int:
+        return 64
+
+    def readinto (self, buf, nbytes: int = None) -> int:
+        count = len(buf) if nbytes is None else nbytes
+        buf[:count] = bytes(count)
+        return count
+
+"""
+The timeouts must hold while bytes keep arriving
+
+"""
+
+def test_garbage_timeouts () -> None:
+    sensor = LD2410B.LD2410B(None, None, uart = GarbageUART())
+    stamp = time.monotonic()
+    try:
+        sensor.collect_data(timeout = 0.2)
+        assert False, "garbage decoded"
+    except ValueError:
+        pass
+    assert time.monotonic() - stamp < 1, "collect_data timeout not kept"
+    stamp = time.monotonic()
+    assert sensor.collect_all() == []
+    assert sensor.collect_all(timeout = 0.2) == []
+    assert time.monotonic() - stamp < 1, "collect_all timeout not kept"
+
+"""
+Every frame of chunked basic / engineering streams comes out, in order
+
+"""
+
+def test_chunked_stream () -> None:
+    lost = []
+    for low, high, engineering in ((30, 30, 1), (1, 64, 1), (1, 64, 0), (1, 64, 0.5), (40, 120, 0.5)):
+        for seed in range(3):
+            sent, got = run(seed, low, high, engineering)
+            if got != sent:
+                lost.append("chunks {}-{} B, {:.0%} engineering, seed {}: {} of {} frames lost".format(
+                    low, high, engineering, seed, sent - got, sent))
+    assert not lost, "\n".join(lost)
+
+if __name__ == "__main__":
+    test_garbage_timeouts()
+    test_chunked_stream()
+    print("OK")
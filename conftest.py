@@ -0,0 +1,2 @@
+#pytest: the *_test.py desktop checks run on CPython, dist_test.py is the example for the board
+collect_ignore = ["dist_test.py"]
@@ -0,0 +1,109 @@
+import os
+import sys
+import types
+from . import devices
+from .w5100s import W5100S
+
+#Desktop hardware layer: run the drivers and the screen time logic under CPython
+#install() registers board, busio, digitalio, analogio, neopixel, micropython and
+#adafruit_bus_device.spi_device, backed by the simulated devices, and puts lib/ on the path
+#
+#    import desktop_hal
+#    hal = desktop_hal.install()
+#    import LD2410B                      # real driver, simulated UART
+#    sensor = LD2410B.LD2410B(board.GP0, board.GP1)
+#    hal.uarts[0].feed(frame)
+#
+#The compiled (.mpy) modules of lib/ cannot be loaded by CPython: the WIZnet DHCP / DNS
+#clients are replaced by stand-ins that raise, so use WIZNET5K(..., is_dhcp = False)
+
+Lib = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+Pins = ["GP{}".format(i) for i in range(29)] + ["LED", "A0", "A1", "A2", "NEOPIXEL"]
+
+class Hal:
+
+    """
+    The installed backends and every device created through them
+
+
+    :param: callable uart: makes the UARTs, called like busio.UART(tx, rx, **kwargs)
+            callable chip: makes the chip model of every SPI bus
+
+    """
+
+    def __init__ (self, uart, chip) -> None:
+        self.uart = uart
+        self.chip = chip
+        self.uarts = []
+        self.spis = []
+        self.pins = {} # name: DigitalInOut
+        self.pixels = []
+
+    def _make_uart (self, tx = None, rx = None, **kwargs):
+        uart = self.uart(tx, rx, **kwargs)
+        self.uarts.append(uart)
+        return uart
+
+    def _make_spi (self, clock = None, MOSI = None, MISO = None):
+        spi = devices.SPI(clock, MOSI, MISO, self.chip() if self.chip else None)
+        self.spis.append(spi)
+        return spi
+
+    def _make_pin (self, pin):
+        gpio = devices.DigitalInOut(pin)
+        self.pins[getattr(pin, "name", pin)] = gpio
+        return gpio
+
+    def _make_pixels (self, pin, n: int, **kwargs):
+        pixels = devices.NeoPixel(pin, n, **kwargs)
+        self.pixels.append(pixels)
+        return pixels
+
+"""
+Compiled WIZnet client stand-in: it can be imported, using it raises
+
+"""
+
+def _compiled (name: str):
+    def missing (*args, **kwargs):
+        raise RuntimeError("{} is compiled for CircuitPython, not available on desktop".format(name))
+    return missing
+
+"""
+Register the simulated hardware modules
+
+:param: callable uart: UART backend, called like busio.UART(tx, rx, **kwargs).
+                       Default: devices.SimUART (e.g. lambda *a, **k: sensor_trace.ReplayUART(records, clock))
+        callable chip: SPI chip model backend. Default: w5100s.W5100S
+        bool force: replace the modules even if the real ones can be imported. Default: True
+
+:return: Hal: the backends and the devices they create
+
+"""
+
+def install (uart = None, chip = W5100S, force: bool = True) -> Hal:
+    hal = Hal(uart or devices.SimUART, chip)
+    if Lib not in sys.path:
+        sys.path.append(Lib)
+
+    def module (name: str, **attrs):
+        if not force and name in sys.modules:
+            return
+        mod = types.ModuleType(name)
+        for key, value in attrs.items():
+            setattr(mod, key, value)
+        sys.modules[name] = mod
+
+    module("board", **{name: devices.Pin(name) for name in Pins})
+    module("busio", UART = hal._make_uart, SPI = hal._make_spi)
+    module("digitalio", DigitalInOut = hal._make_pin, Direction = devices.Direction, Pull = devices.Pull)
+    module("analogio", AnalogIn = devices.AnalogIn)
+    module("neopixel", NeoPixel = hal._make_pixels, GRB = "GRB", RGB = "RGB")
+    module("micropython", const = devices.const)
+    import adafruit_bus_device
+    module("adafruit_bus_device.spi_device", SPIDevice = devices.SPIDevice)
+    adafruit_bus_device.spi_device = sys.modules["adafruit_bus_device.spi_device"]
+    import adafruit_wiznet5k
+    module("adafruit_wiznet5k.adafruit_wiznet5k_dhcp", DHCP = _compiled("DHCP"))
+    module("adafruit_wiznet5k.adafruit_wiznet5k_dns", DNS = _compiled("DNS"))
+    return hal
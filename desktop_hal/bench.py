@@ -0,0 +1,495 @@
+import sys
+import time
+import types
+import argparse
+import cProfile
+import pstats
+import tempfile
+import tracemalloc
+import linecache
+import warnings
+import subprocess
+import os
+import desktop_hal
+
+#Benchmark suites for the hot paths, on the simulated hardware
+#python -m desktop_hal.bench                      every suite
+#python -m desktop_hal.bench ld2410b wiznet_write  some suites
+#python -m desktop_hal.bench --profile pipeline   cProfile of a suite, 20 most expensive functions
+#
+#python -m desktop_hal.bench --against 1a2b3c4 ld2410b   also time the drivers of an older commit
+#
+#The ld2410b / wiznet_write / wiznet_calls suites time the working tree ("now"), and the drivers of the
+#commits given with --against (hash, tag, HEAD~3...: anything git rev-parse takes) loaded with git show.
+#A commit git cannot find (shallow clone, squashed history, no git) or without the file is skipped
+#
+#Allocations are counted per call for the code under test only, not the simulated devices (see allocations()):
+#on CircuitPython every allocated byte stays on the heap until the next gc
+#The frame path suites list the lines still allocating under their figures (see sources())
+
+hal = desktop_hal.install()
+
+import board
+import busio
+import digitalio
+from desktop_hal import devices
+import LD2410B
+import tasks
+import trace_bench
+from adafruit_wiznet5k.adafruit_wiznet5k import WIZNET5K
+
+Peer = b"\x0a\x00\x00\x02"
+Root = os.path.dirname(desktop_hal.Lib)
+Driver = "lib/adafruit_wiznet5k/adafruit_wiznet5k.py"
+Sensor = "LD2410B.py"
+
+Against = [] # older commits to compare with, from --against
+_commits = {} # --against name: commit hash
+_loaded = {} # (commit, path): module
+
+def git (*args) -> str:
+    return subprocess.run(("git",) + args, cwd = Root, check = True, capture_output = True, text = True).stdout
+
+"""
+Commit of a revision
+
+:param: str name: anything git rev-parse takes (hash, tag, HEAD~3)
+
+:return: str: commit hash, None if git cannot find it
+
+"""
+
+def commit (name: str) -> str:
+    try:
+        return git("rev-parse", "--verify", "--quiet", name + "^{commit}").strip()
+    except (OSError, subprocess.CalledProcessError): # no git, not a repository, unknown commit
+        return None
+
+"""
+Load a module as it is in a revision
+
+:param: str name: revision given with --against, None for the working tree
+        str path: file in the repo (Driver / Sensor)
+        module current: the module of the working tree
+
+:return: module: None if the file is not in that revision
+
+"""
+
+def revision (name: str, path: str, current):
+    if name is None:
+        return current
+    key = (_commits[name], path)
+    if key not in _loaded:
+        try:
+            source = git("show", "{}:{}".format(*key))
+        except subprocess.CalledProcessError:
+            return None
+        # MicroPython takes any byteorder but "little" as big-endian, CPython only "big"
+        source = source.replace('from_bytes(val, "b")', 'from_bytes(val, "big")')
+        module = types.ModuleType("{}_{}".format(os.path.basename(path)[:-3], key[0][:7]))
+        module.__file__ = path
+        module.pin = object # bare annotation of the early LD2410B constructors
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", SyntaxWarning) # "is" with a literal in the early LD2410B
+            code = compile(source, "{} ({})".format(path, name), "exec")
+        exec(code, module.__dict__)
+        _loaded[key] = module
+    return _loaded[key]
+
+"""
+The revisions of a file to compare: the --against commits that have it, then the working tree
+
+:param: str path: file in the repo (Driver / Sensor)
+        module current: the module of the working tree
+
+:return: list: (name, module), name None for the working tree
+
+"""
+
+def compared (path: str, current) -> list:
+    modules = []
+    for name in Against:
+        module = revision(name, path, current)
+        if module is None:
+            print("{}: no {} in {}, skipped".format(label(name), path, name))
+        else:
+            modules.append((name, module))
+    modules.append((None, current))
+    return modules
+
+"""
+Time a function
+
+:param: callable func: called without arguments
+        int count: number of calls
+
+:return: float: seconds per call
+
+"""
+
+def timed (func, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+"""
+Allocations made by the code of some files, with tracemalloc
+CPython frees most objects as soon as they are dropped, so the memory is read at every traced line:
+a line that raised the peak, including the C functions it called, allocated that many bytes.
+Only the largest allocation of a line is seen. The frame object CPython creates to trace a call is
+left out, CPython only allocations (range() in a for loop, ints above 256) are counted.
+The allocating lines are kept in allocations.lines for sources()
+
+:param: callable func: called without arguments
+        int count: number of calls
+        str paths: source files of the code to count, see code_file()
+
+:return: tuple: (allocations, bytes) per call
+
+"""
+
+def allocations (func, count: int, *paths) -> tuple:
+    owner = None # (file, line) of the code running since the last event, None when not in paths
+    last = steps = size = 0
+    lines = {} # (file, line): [allocations, bytes]
+
+    def event (frame, kind, arg):
+        nonlocal owner, last, steps, size
+        grown = tracemalloc.get_traced_memory()[1] - last
+        if kind == "call":
+            grown -= sys.getsizeof(frame) # made for this call to the trace function
+        if owner and grown > 0:
+            steps += 1
+            size += grown
+            line = lines.setdefault(owner, [0, 0])
+            line[0] += 1
+            line[1] += grown
+        grown = None # freed before the memory is read again
+        if kind == "return":
+            frame = frame.f_back # the rest of the caller's line
+        owner = None
+        if kind != "call" and frame is not None and frame.f_code.co_filename in paths:
+            owner = (frame.f_code.co_filename, frame.f_lineno)
+        last = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        return event
+
+    tracemalloc.start()
+    sys.settrace(event)
+    try:
+        func() # first call allocations (caches, buffers, line tables for tracing) are not counted
+        steps = size = 0
+        lines.clear()
+        for i in range(count):
+            func()
+    finally:
+        sys.settrace(None)
+        tracemalloc.stop()
+    allocations.lines = {key: (steps / count, size / count) for key, (steps, size) in lines.items()}
+    return steps / count, size / count
+
+"""
+Print the lines that allocated in the last allocations() call
+Lines allocating less than once every 20 units (setup, first use, periodic reports) are summed up in one line
+
+:param: int per: calls of the measured function per reported unit (frames of a replay). Default: 1
+
+"""
+
+def sources (per: int = 1) -> None:
+    rare = []
+    board = [0, 0] # allocations, bytes left on CircuitPython
+    for (path, number), (steps, size) in sorted(allocations.lines.items()):
+        if steps / per < 0.05:
+            rare.append(size / per)
+            board[0] += steps
+            board[1] += size
+            continue
+        text = linecache.getline(path, number).strip()
+        # CircuitPython has 30-bit floats and small ints in the object itself, CPython allocates them
+        if round(size / steps) == sys.getsizeof(0.5):
+            note = "  (float, CPython only)"
+        elif text.endswith("+= 1") and round(size / steps) <= 32:
+            note = "  (int above 256, CPython only)"
+        else:
+            note = ""
+            board[0] += steps
+            board[1] += size
+        print("             {:7.3f} x {:4.0f} B  {}:{}  {}{}".format(
+            steps / per, size / steps, os.path.basename(path), number, text, note))
+    if rare:
+        print("             {} lines allocating less than once every 20: {:.0f} B in all".format(len(rare), sum(rare) * per))
+    print("             without the CPython only ones: {:.2f} allocations {:.0f} B".format(board[0] / per, board[1] / per))
+
+allocations.lines = {}
+
+def code_file (obj) -> str:
+    return type(obj).__init__.__code__.co_filename
+
+def label (name: str) -> str:
+    return (name or "now")[:15]
+
+"""
+WIZNET5K on a simulated W5100S, socket 0 connected to the peer
+
+:param: float send_delay: SEND round trip of the chip model in seconds. Default: 0
+        module module: driver module of a revision, see compared(). Default: None (working tree)
+
+:return: tuple: (WIZNET5K, SPI bus)
+
+"""
+
+def wiznet (send_delay: float = 0, module = None) -> tuple:
+    driver = WIZNET5K if module is None else module.WIZNET5K
+    spi = busio.SPI(board.GP18, MOSI = board.GP19, MISO = board.GP16)
+    spi.chip.send_delay = send_delay
+    sleep = time.sleep
+    time.sleep = lambda seconds: None # chip reset delays, nothing to wait for on the model
+    try:
+        eth = driver(spi, digitalio.DigitalInOut(board.GP17), is_dhcp = False)
+    finally:
+        time.sleep = sleep
+    eth.socket_connect(0, Peer, 1883)
+    return eth, spi
+
+"""
+Time, bus traffic and allocations of a function
+
+:param: SPI spi: bus to count
+        callable func: called without arguments
+        int count: number of calls
+        str path: source file whose allocations are counted
+
+:return: str: per call figures
+
+"""
+
+def bus_cost (spi, func, count: int, path: str) -> str:
+    frames, calls, size = spi.frames, spi.calls, spi.bytes
+    seconds = timed(func, count)
+    frames, calls, size = spi.frames - frames, spi.calls - calls, spi.bytes - size
+    steps, heap = allocations(func, 10, path)
+    return "{:7.1f} us, {:4.1f} CS frames, {:6.1f} bus calls, {:6.0f} bytes, {:6.1f} allocations {:6.0f} B".format(
+        seconds * 1e6, frames / count, calls / count, size / count, steps, heap)
+
+class PacedUART (devices.SimUART):
+
+    """
+    UART receiving one more frame on every tick() and after a flush (older drivers flush first)
+
+
+    :param: bytes frame: the frame sent by the module
+
+    """
+
+    def __init__ (self, frame) -> None:
+        super().__init__(receiver_buffer_size = 1 << 16)
+        self.frame = frame
+
+    def tick (self) -> None:
+        self.feed(self.frame)
+
+    def reset_input_buffer (self) -> None:
+        super().reset_input_buffer()
+        self.tick()
+
+def suite_ld2410b () -> None:
+    frame = trace_bench.report_frame(LD2410B.Target_both, 80)
+    # user-003: per call gc.collect() and allocations of the frame path
+    for name, module in compared(Sensor, LD2410B):
+        sensor = module.LD2410B(board.GP0, board.GP1)
+        uart = sensor.uart = PacedUART(frame)
+
+        def one ():
+            uart.tick()
+            sensor.collect_data()
+
+        one()
+        seconds = timed(one, 2000)
+        steps, size = allocations(one, 50, code_file(sensor))
+        print("ld2410b      collect_data, {:15}: {:7.1f} us, {:7.0f} frames/s, {:5.1f} allocations {:5.0f} B per frame".format(
+            label(name), seconds * 1e6, 1 / seconds, steps, size))
+        if name is None:
+            sources()
+    sensor = LD2410B.LD2410B(board.GP0, board.GP1)
+    uart = hal.uarts[-1]
+    uart.size = 1 << 20
+
+    def one ():
+        uart.feed(frame)
+        sensor.poll()
+
+    seconds = timed(one, 20000)
+    steps, size = allocations(one, 50, code_file(sensor))
+    print("ld2410b      poll, now: {:7.1f} us, {:7.0f} frames/s, {:5.1f} allocations {:5.0f} B per frame ({} decoded)".format(
+        seconds * 1e6, 1 / seconds, steps, size, sensor.frames))
+    sources()
+
+def suite_wiznet_write () -> None:
+    # user-011: header and payload as bursts instead of one bus write per byte
+    for name, module in compared(Driver, None):
+        eth, spi = wiznet(module = module)
+        for size in (64, 256, 2048):
+            data = bytes(size)
+            print("wiznet_write socket_write {:4} B, {:15}: {}".format(size, label(name),
+                bus_cost(spi, lambda: eth.socket_write(0, data), 300, code_file(eth))))
+        print("wiznet_write 1-byte register, {:15}: {}".format(label(name),
+            bus_cost(spi, lambda: eth.write(0x0402, 0x0C, 0), 2000, code_file(eth))))
+
+def suite_wiznet_read () -> None:
+    eth, spi = wiznet()
+    chip = spi.chip
+    buf = bytearray(2048)
+    for size in (16, 256, 2048):
+        data = bytes(size)
+
+        def one ():
+            chip.deliver(0, data)
+            eth.socket_recv_into(0, buf)
+
+        print("wiznet_read  socket_recv_into {:4} B: {}".format(size, bus_cost(spi, one, 500, code_file(eth))))
+
+def suite_wiznet_calls () -> None:
+    topic = b"user/feeds/light"
+    value = b"#26fc05"
+    # MiniMQTT sends a publish as fixed header, topic and payload
+    parts = (bytes((0x30, 2 + len(topic) + len(value))), bytes((0, len(topic))) + topic, value)
+    # user-013: 16-bit registers in one transfer, user-015: register access picked at detect time
+    for name, module in compared(Driver, None):
+        eth, spi = wiznet(module = module)
+        chip = spi.chip
+
+        def publish ():
+            for part in parts:
+                eth.socket_write(0, part)
+
+        def packet ():
+            # a 4-byte PUBACK read as MiniMQTT does: type, length, body
+            chip.deliver(0, b"\x40\x02\x00\x01")
+            eth.socket_available(0)
+            eth.socket_read(0, 1)
+            eth.socket_read(0, 1)
+            eth.socket_read(0, 2)
+
+        def read ():
+            chip.deliver(0, b"\x00\x01")
+            eth.socket_read(0, 2)
+
+        for what, func in (("publish", publish), ("4 B packet", packet), ("socket_write 16 B", lambda: eth.socket_write(0, bytes(16))),
+                           ("socket_read 2 B", read)):
+            print("wiznet_calls {:17}, {:15}: {}".format(what, label(name), bus_cost(spi, func, 500, code_file(eth))))
+
+def suite_wiznet_poll () -> None:
+    eth, spi = wiznet()
+    sockets = range(eth.max_sockets)
+    print("wiznet_poll  poll of {} sockets: {}".format(len(sockets), bus_cost(spi, lambda: eth.poll(sockets), 2000, code_file(eth))))
+
+def suite_wiznet_stream () -> None:
+    # user-018: SENDs in flight while the next write goes into the TX buffer
+    data = bytes(range(256)) * 64
+    for delay in (0.001, 0.005):
+        for stream in (False, True):
+            eth, spi = wiznet(delay)
+            eth.socket_set_stream(0, stream)
+            start = time.perf_counter()
+            view = memoryview(data)
+            sent = 0
+            while sent < len(data):
+                sent += eth.socket_write(0, view[sent:])
+            eth.socket_flush(0)
+            seconds = time.perf_counter() - start
+            print("wiznet_stream 16 KB, {:.0f} ms SEND round trip, {:9}: {:6.1f} ms, {:2} SEND, {} overlap".format(
+                delay * 1000, "streamed" if stream else "blocking", seconds * 1000, spi.chip.sends, spi.chip.overlaps))
+    # 100 small publishes as MiniMQTT writes them: fixed header, topic, payload
+    topic = b"\x00\x1auser/feeds/screen-time.light"
+    payload = b"#26fc05"
+    header = bytes((0x30, len(topic) + len(payload)))
+    for delay in (0, 0.001, 0.005):
+        for stream in (False, True):
+            eth, spi = wiznet(delay)
+            eth.socket_set_stream(0, stream)
+            start = time.perf_counter()
+            for i in range(100):
+                eth.socket_write(0, header)
+                eth.socket_write(0, topic)
+                eth.socket_write(0, payload)
+            written = time.perf_counter() - start
+            eth.socket_flush(0)
+            seconds = time.perf_counter() - start
+            assert len(spi.chip.sent[0]) == 100 * (len(header) + len(topic) + len(payload))
+            print("wiznet_stream 100 publishes x 3 writes, {:.0f} ms SEND round trip, {:9}: written in {:6.1f} ms, sent in {:6.1f} ms, {:3} SEND".format(
+                delay * 1000, "streamed" if stream else "blocking", written * 1000, seconds * 1000, spi.chip.sends))
+
+def suite_publish () -> None:
+    queue = tasks.PublishQueue(clock = lambda: 0)
+    colours = ("#26fc05", "#faf207", "#fc0905", "#000000")
+    count = 20000
+
+    def one ():
+        queue.put("light", colours[one.i & 3])
+        one.i += 1
+        queue.flush(lambda feed, value: None)
+
+    one.i = 0
+    seconds = timed(one, count)
+    steps, size = allocations(one, 200, code_file(queue))
+    print("publish      put + flush: {:5.1f} us, {:4.1f} allocations {:4.0f} B".format(seconds * 1e6, steps, size))
+
+def suite_pipeline () -> None:
+    path = os.path.join(tempfile.gettempdir(), "desktop_hal_trace.bin")
+    trace_bench.synthesize(path, 30)
+    stats = trace_bench.replay(trace_bench.sensor_trace.load(path), 600, 0.01)
+    print("pipeline     30 min trace: {} frames in {:.3f} s, {:.0f} frames/s".format(
+        stats["frames"], stats["wall"], stats["frames"] / stats["wall"]))
+    # allocations of the driver and the screen time logic, not of the replay around them
+    trace_bench.synthesize(path, 2)
+    records = trace_bench.sensor_trace.load(path)
+    os.remove(path)
+    frames = trace_bench.replay(records, 600, 0.01)["frames"]
+    steps, size = allocations(lambda: trace_bench.replay(records, 600, 0.01), 1,
+                              LD2410B.__file__, trace_bench.screen_time.__file__)
+    print("pipeline     2 min trace: {:.1f} allocations {:.0f} B per frame in LD2410B / screen_time".format(
+        steps / frames, size / frames))
+    sources(frames)
+
+Suites = {
+    "ld2410b": suite_ld2410b,
+    "wiznet_write": suite_wiznet_write,
+    "wiznet_read": suite_wiznet_read,
+    "wiznet_calls": suite_wiznet_calls,
+    "wiznet_poll": suite_wiznet_poll,
+    "wiznet_stream": suite_wiznet_stream,
+    "publish": suite_publish,
+    "pipeline": suite_pipeline,
+}
+
+def main (argv = None) -> None:
+    parser = argparse.ArgumentParser(description = "Benchmark the drivers and the screen time logic on simulated hardware")
+    parser.add_argument("suites", nargs = "*", help = "suites to run, all by default: " + ", ".join(Suites))
+    parser.add_argument("--profile", action = "store_true", help = "run under cProfile and print the top functions")
+    parser.add_argument("--against", action = "append", default = [], metavar = "COMMIT",
+                        help = "also time the drivers of this commit (hash, tag, HEAD~3), can be repeated")
+    args = parser.parse_args(argv)
+    names = args.suites or list(Suites)
+    for name in names:
+        if name not in Suites:
+            parser.error("unknown suite: " + name)
+    for name in args.against:
+        _commits[name] = commit(name)
+        if _commits[name] is None:
+            print("{}: commit not found, skipped".format(name))
+        else:
+            Against.append(name)
+    profile = cProfile.Profile() if args.profile else None
+    for name in names:
+        if profile:
+            profile.runcall(Suites[name])
+        else:
+            Suites[name]()
+    if profile:
+        pstats.Stats(profile).sort_stats("tottime").print_stats(20)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,258 @@
+#Simulated CircuitPython devices: pins, UART, SPI, GPIO, analog input and NeoPixel
+#Every class has the subset of the CircuitPython API the drivers and the app use
+
+class Pin:
+
+    """
+    Board pin (board.GP0 ...)
+
+
+    :param: str name: pin name
+
+    """
+
+    def __init__ (self, name: str) -> None:
+        self.name = name
+
+    def __repr__ (self) -> str:
+        return "board." + self.name
+
+class SimUART:
+
+    """
+    UART with a software receive buffer
+    Bytes given to feed() are read back by the driver, bytes written by the driver are kept
+
+
+    :param: tx / rx: pins (unused)
+            int receiver_buffer_size: bytes kept before the oldest ones are lost. Default: 64
+
+    """
+
+    def __init__ (self, tx = None, rx = None, baudrate: int = 9600, receiver_buffer_size: int = 64, **kwargs) -> None:
+        self.baudrate = baudrate
+        self.size = receiver_buffer_size
+        self._rx = bytearray()
+        self.written = bytearray()
+        self.overruns = 0 # bytes lost because the receive buffer was full
+
+    """
+    Receive bytes, as if the device had sent them
+
+    :param: bytes data: received bytes
+
+    """
+
+    def feed (self, data) -> None:
+        self._rx += data
+        if len(self._rx) > self.size:
+            self.overruns += len(self._rx) - self.size
+            del self._rx[:len(self._rx) - self.size]
+
+    @property
+    def in_waiting (self) -> int:
+        return len(self._rx)
+
+    def readinto (self, buf, nbytes: int = None) -> int:
+        count = min(len(buf) if nbytes is None else nbytes, len(self._rx))
+        buf[:count] = self._rx[:count]
+        del self._rx[:count]
+        return count
+
+    def read (self, nbytes: int = None) -> bytes:
+        if nbytes is None:
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data if data else None
+
+    def write (self, data) -> int:
+        self.written += data
+        return len(data)
+
+    def reset_input_buffer (self) -> None:
+        self._rx = bytearray()
+
+    def deinit (self) -> None:
+        pass
+
+class SPI:
+
+    """
+    SPI bus with a chip model behind it (see desktop_hal.w5100s)
+    The chip model gets begin() / end() around every chip select and the bytes of every transfer
+
+
+    :param: clock / MOSI / MISO: pins (unused)
+            chip: chip model, None for a bus with nothing on it
+
+    """
+
+    def __init__ (self, clock = None, MOSI = None, MISO = None, chip = None) -> None:
+        self.chip = chip
+        self.frames = 0 # chip selects
+        self.calls = 0 # write / readinto calls
+        self.bytes = 0 # bytes on the wire
+
+    def try_lock (self) -> bool:
+        return True
+
+    def unlock (self) -> None:
+        pass
+
+    def configure (self, **kwargs) -> None:
+        pass
+
+    def write (self, buf, start: int = 0, end: int = None) -> None:
+        end = len(buf) if end is None else end
+        self.calls += 1
+        self.bytes += end - start
+        if self.chip is not None:
+            self.chip.on_write(buf, start, end)
+
+    def readinto (self, buf, start: int = 0, end: int = None, write_value: int = 0) -> None:
+        end = len(buf) if end is None else end
+        self.calls += 1
+        self.bytes += end - start
+        if self.chip is not None:
+            self.chip.on_read(buf, start, end)
+        else:
+            for i in range(start, end):
+                buf[i] = 0xFF
+
+    def deinit (self) -> None:
+        pass
+
+class SPIDevice:
+
+    """
+    adafruit_bus_device.spi_device.SPIDevice: selects the chip for the duration of a with block
+
+
+    :param: SPI spi: bus
+            DigitalInOut chip_select: CS pin
+
+    """
+
+    def __init__ (self, spi: SPI, chip_select = None, baudrate: int = 100000, polarity: int = 0, phase: int = 0,
+                  extra_clocks: int = 0) -> None:
+        self.spi = spi
+        self.chip_select = chip_select
+
+    def __enter__ (self) -> SPI:
+        self.spi.frames += 1
+        if self.chip_select is not None:
+            self.chip_select.value = False
+        if self.spi.chip is not None:
+            self.spi.chip.begin()
+        return self.spi
+
+    def __exit__ (self, *exc) -> bool:
+        if self.spi.chip is not None:
+            self.spi.chip.end()
+        if self.chip_select is not None:
+            self.chip_select.value = True
+        return False
+
+class Direction:
+    INPUT = 0
+    OUTPUT = 1
+
+class Pull:
+    UP = 1
+    DOWN = 2
+
+class DigitalInOut:
+
+    """
+    GPIO pin, the value can be set from the test to simulate an input
+
+
+    :param: Pin pin: board pin
+
+    """
+
+    def __init__ (self, pin) -> None:
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self.value = False
+
+    def switch_to_output (self, value: bool = False, **kwargs) -> None:
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input (self, pull = None) -> None:
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def deinit (self) -> None:
+        pass
+
+class AnalogIn:
+
+    """
+    Analog input, value (0 - 65535) can be set from the test
+
+
+    :param: Pin pin: board pin
+
+    """
+
+    def __init__ (self, pin) -> None:
+        self.pin = pin
+        self.value = 0
+        self.reference_voltage = 3.3
+
+    def deinit (self) -> None:
+        pass
+
+class NeoPixel:
+
+    """
+    NeoPixel strip: keeps the colours and counts the updates sent to the LEDs
+
+
+    :param: Pin pin: data pin
+            int n: number of pixels
+
+    """
+
+    def __init__ (self, pin, n: int, brightness: float = 1.0, auto_write: bool = True, **kwargs) -> None:
+        self.pin = pin
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self.pixels = [(0, 0, 0)] * n
+        self.shows = 0
+        self.shown = list(self.pixels) # colours on the LEDs after the last show()
+
+    def __len__ (self) -> int:
+        return len(self.pixels)
+
+    def __getitem__ (self, i):
+        return self.pixels[i]
+
+    def __setitem__ (self, i, colour) -> None:
+        self.pixels[i] = tuple(colour)
+        if self.auto_write:
+            self.show()
+
+    def fill (self, colour) -> None:
+        self.pixels = [tuple(colour)] * len(self.pixels)
+        if self.auto_write:
+            self.show()
+
+    def show (self) -> None:
+        self.shows += 1
+        self.shown = list(self.pixels)
+
+    def deinit (self) -> None:
+        pass
+
+"""
+micropython.const: the value itself
+
+"""
+
+def const (value):
+    return value
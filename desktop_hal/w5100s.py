@@ -0,0 +1,210 @@
+import time
+
+#W5100S model behind the simulated SPI bus
+#Byte addressed like the chip: 0xF0 = write / 0x0F = read, 16-bit address, then data (auto increment)
+#Registers live in a 64 KB memory, the socket commands and the TX / RX rings are modelled:
+#SEND completes after send_delay, CONNECT after connect_delay, deliver() puts data in the RX ring
+
+Sockets = 4
+Sock_reg = 0x0400 # socket n registers at Sock_reg + n * 0x100
+Tx_base = 0x4000 # socket TX / RX memory, Sock_mem per socket with the default sizes
+Rx_base = 0x6000
+Sock_mem = 0x800
+
+# Socket register offsets
+Sn_MR = 0x00
+Sn_CR = 0x01
+Sn_IR = 0x02
+Sn_SR = 0x03
+Sn_RXBUF_SIZE = 0x1E
+Sn_TXBUF_SIZE = 0x1F
+Sn_TX_FSR = 0x20
+Sn_TX_WR = 0x24
+Sn_RX_RSR = 0x26
+Sn_RX_RD = 0x28
+
+class W5100S:
+
+    """
+    W5100S register / ring buffer model
+    Pass it as the chip of desktop_hal.devices.SPI, the real adafruit_wiznet5k driver talks to it
+
+
+    :param: float send_delay: seconds from SEND to SEND_OK (network round trip). Default: 0
+            float connect_delay: seconds from CONNECT to ESTABLISHED. Default: 0
+            callable clock: time source in seconds. Default: time.monotonic
+
+    """
+
+    def __init__ (self, send_delay: float = 0, connect_delay: float = 0, clock = time.monotonic) -> None:
+        self.mem = bytearray(0x10000)
+        self.mem[0x0080] = 0x51 # VERSIONR
+        self.mem[0x003C] = 0x01 # PHYSR: link up
+        for n in range(Sockets):
+            self.mem[Sock_reg + n * 0x100 + Sn_RXBUF_SIZE] = 2 # reset value, KB
+            self.mem[Sock_reg + n * 0x100 + Sn_TXBUF_SIZE] = 2
+        self.send_delay = send_delay
+        self.connect_delay = connect_delay
+        self.clock = clock
+        self._header = bytearray()
+        self._addr = None
+        self._pending = [] # (time, callable) chip events not done yet
+        self._in_flight = [False] * Sockets
+        self._acked = [0] * Sockets # TX pointer up to which the data is sent
+        self._sent_wr = [0] * Sockets # Sn_TX_WR at the last SEND: the chip only counts data once sent
+        self._recv_rd = [0] * Sockets # Sn_RX_RD at the last RECV
+        self.sends = 0
+        self.overlaps = 0 # SEND issued while the previous one had no SEND_OK yet
+        self.sent = [bytearray() for n in range(Sockets)] # data sent by every socket
+        self.latency = [] # SEND to SEND_OK, seconds
+
+    def reg (self, n: int, offset: int) -> int:
+        return Sock_reg + n * 0x100 + offset
+
+    def word (self, addr: int) -> int:
+        return (self.mem[addr] << 8) | self.mem[addr + 1]
+
+    def set_word (self, addr: int, value: int) -> None:
+        self.mem[addr] = value >> 8 & 0xFF
+        self.mem[addr + 1] = value & 0xFF
+
+    """
+    Receive data on a socket, as if the peer had sent it (RECV interrupt set)
+
+    :param: int n: socket
+            bytes data: received bytes
+
+    """
+
+    def deliver (self, n: int, data) -> None:
+        size = self.mem[self.reg(n, Sn_RXBUF_SIZE)] << 10
+        base, mask = self._ring(Rx_base, n, Sn_RXBUF_SIZE)
+        rsr = self.word(self.reg(n, Sn_RX_RSR))
+        if rsr + len(data) > size:
+            raise ValueError("RX buffer overrun")
+        ptr = self.word(self.reg(n, Sn_RX_RD)) + rsr
+        for i, b in enumerate(data):
+            self.mem[base + ((ptr + i) & mask)] = b
+        self.set_word(self.reg(n, Sn_RX_RSR), rsr + len(data))
+        self.mem[self.reg(n, Sn_IR)] |= 0x04
+
+    """
+    Open a connection on a socket as if a peer had connected (ESTABLISHED)
+
+    :param: int n: socket
+
+    """
+
+    def establish (self, n: int) -> None:
+        self.mem[self.reg(n, Sn_SR)] = 0x17
+        self.mem[self.reg(n, Sn_IR)] |= 0x01
+
+    def begin (self) -> None:
+        self._header = bytearray()
+        self._addr = None
+
+    def end (self) -> None:
+        pass
+
+    def on_write (self, buf, start: int, end: int) -> None:
+        i = start
+        while self._addr is None and i < end:
+            self._header.append(buf[i])
+            i += 1
+            if len(self._header) == 3:
+                self._addr = (self._header[1] << 8) | self._header[2]
+        while i < end:
+            self._poke(self._addr, buf[i])
+            self._addr += 1
+            i += 1
+
+    def on_read (self, buf, start: int, end: int) -> None:
+        self._run_events()
+        for i in range(start, end):
+            buf[i] = self._peek(self._addr)
+            self._addr += 1
+
+    def _ring (self, base: int, n: int, size_reg: int) -> tuple:
+        # socket memories follow each other, each one as large as its size register
+        offset = 0
+        for i in range(n):
+            offset += self.mem[self.reg(i, size_reg)] << 10
+        return base + offset, (self.mem[self.reg(n, size_reg)] << 10) - 1
+
+    def _run_events (self) -> None:
+        if not self._pending:
+            return
+        now = self.clock()
+        for event in list(self._pending):
+            if now >= event[0]:
+                self._pending.remove(event)
+                event[1]()
+
+    def _peek (self, addr: int) -> int:
+        addr &= 0xFFFF
+        if Sock_reg <= addr < Sock_reg + Sockets * 0x100 and addr & 0xFF in (Sn_TX_FSR, Sn_TX_FSR + 1):
+            n = (addr - Sock_reg) >> 8
+            size = self.mem[self.reg(n, Sn_TXBUF_SIZE)] << 10
+            free = size - ((self._sent_wr[n] - self._acked[n]) & 0xFFFF)
+            return free >> 8 if addr & 0xFF == Sn_TX_FSR else free & 0xFF
+        return self.mem[addr]
+
+    def _poke (self, addr: int, value: int) -> None:
+        addr &= 0xFFFF
+        if Sock_reg <= addr < Sock_reg + Sockets * 0x100:
+            n = (addr - Sock_reg) >> 8
+            offset = addr & 0xFF
+            if offset == Sn_IR: # write 1 to clear
+                self.mem[addr] &= ~value & 0xFF
+                return
+            if offset == Sn_CR:
+                self._command(n, value)
+                return
+        self.mem[addr] = value
+        if addr == 0 and value & 0x80: # MR reset
+            self.mem[0] = 0x03
+
+    def _command (self, n: int, cmd: int) -> None:
+        sr = self.reg(n, Sn_SR)
+        ir = self.reg(n, Sn_IR)
+        if cmd == 0x01: # OPEN
+            protocol = self.mem[self.reg(n, Sn_MR)] & 0x0F
+            self.mem[sr] = 0x13 if protocol == 1 else 0x22
+            self._acked[n] = self._sent_wr[n] = self.word(self.reg(n, Sn_TX_WR))
+            self._recv_rd[n] = self.word(self.reg(n, Sn_RX_RD))
+        elif cmd == 0x02: # LISTEN
+            self.mem[sr] = 0x14
+        elif cmd == 0x04: # CONNECT
+            self.mem[sr] = 0x15
+            self._pending.append((self.clock() + self.connect_delay, lambda: self.establish(n)))
+        elif cmd in (0x08, 0x10): # DISCON / CLOSE
+            self.mem[sr] = 0x00
+            self._in_flight[n] = False
+        elif cmd == 0x20: # SEND
+            wr = self.word(self.reg(n, Sn_TX_WR))
+            base, mask = self._ring(Tx_base, n, Sn_TXBUF_SIZE)
+            ptr = self._sent_wr[n]
+            while ptr != wr:
+                self.sent[n].append(self.mem[base + (ptr & mask)])
+                ptr = (ptr + 1) & 0xFFFF
+            self.sends += 1
+            if self._in_flight[n]:
+                self.overlaps += 1
+            self._in_flight[n] = True
+            self._sent_wr[n] = wr
+            stamp = self.clock()
+
+            def done ():
+                self.latency.append(self.clock() - stamp)
+                self._acked[n] = wr
+                self._in_flight[n] = False
+                self.mem[ir] |= 0x10
+
+            self._pending.append((stamp + self.send_delay, done))
+        elif cmd == 0x40: # RECV: release what the driver has read
+            rd = self.word(self.reg(n, Sn_RX_RD))
+            read = (rd - self._recv_rd[n]) & 0xFFFF
+            self._recv_rd[n] = rd
+            rsr = self.reg(n, Sn_RX_RSR)
+            self.set_word(rsr, max(0, self.word(rsr) - read))
+        self.mem[self.reg(n, Sn_CR)] = 0 # command accepted
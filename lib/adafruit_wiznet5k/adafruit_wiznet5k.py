@@ -50,6 +50,8 @@ REG_SHAR = const(0x0009)  # Source Hardware Address
 REG_SIPR = const(0x000F)  # Source IP Address
 REG_PHYCFGR = const(0x002E)  # W5500 PHY Configuration
 REG_PHYCFGR_W5100S = const(0x003C)  # W5100S PHY Configuration
+REG_SIMR_W5500 = const(0x0018)  # W5500 Socket Interrupt Mask
+REG_IMR_W5100S = const(0x0016)  # W5100S Interrupt Mask
 
 # Wiznet5k Socket Registers
 REG_SNMR = const(0x0000)  # Socket n Mode
@@ -63,6 +65,9 @@ REG_SNRX_RSR = const(0x0026)  # RX Free Size
 REG_SNRX_RD = const(0x0028)  # Read Size Pointer
 REG_SNTX_FSR = const(0x0020)  # Socket n TX Free Size
 REG_SNTX_WR = const(0x0024)  # TX Write Pointer
+REG_SNIMR = const(0x002C)  # Socket n Interrupt Mask
+REG_SNRXBUF_SIZE = const(0x001E)  # Socket n RX Buffer Size (KB)
+REG_SNTXBUF_SIZE = const(0x001F)  # Socket n TX Buffer Size (KB)
 
 # SNSR Commands
 SNSR_SOCK_CLOSED = const(0x00)
@@ -99,9 +104,27 @@ SNIR_RECV = const(0x04)
 SNIR_DISCON = const(0x02)
 SNIR_CON = const(0x01)
 
+# Waits: first backoff delay and default longest delay, in seconds
+WAIT_MIN = 0.001
+WAIT_MAX = 0.016
+# With an INTn pin, poll anyway this often in case an interrupt is missed
+WAIT_IRQ_POLL = 0.1
+# Longest time for the chip to accept a socket command
+CMD_TIMEOUT = 1
+# Default seconds between two PHY link reads
+LINK_INTERVAL = 1
+# Resolver cache: hostnames kept, seconds an address is kept if the
+# DNS answer gives no TTL, longest TTL honoured
+DNS_CACHE_SIZE = 4
+DNS_TTL = 300
+DNS_TTL_MAX = 86400
+
 CH_SIZE = const(0x100)
-SOCK_SIZE = const(0x800)  # MAX W5k socket size
+SOCK_SIZE = const(0x800)  # Default W5k socket size
 SOCK_MASK = const(0x7FF)
+# Socket buffer memory in KB, for each of RX and TX
+SOCK_MEMORY_W5500 = const(16)
+SOCK_MEMORY_W5100S = const(8)
 # Register commands
 MR_RST = const(0x80)  # Mode Register RST
 # Socket mode register
@@ -112,7 +135,6 @@ SNMR_IPRAW = const(0x03)
 SNMR_MACRAW = const(0x04)
 SNMR_PPPOE = const(0x05)
 
-MAX_PACKET = const(4000)
 LOCAL_PORT = const(0x400)
 # Default hardware MAC address
 DEFAULT_MAC = (0xDE, 0xAD, 0xBE, 0xEF, 0xFE, 0xED)
@@ -122,12 +144,6 @@ W5200_W5500_MAX_SOCK_NUM = const(0x08)
 W5100_MAX_SOCK_NUM = const(0x04)
 SOCKET_INVALID = const(255)
 
-# UDP socket struct.
-UDP_SOCK = {"bytes_remaining": 0, "remote_ip": 0, "remote_port": 0}
-
-# Source ports in use
-SRC_PORTS = [0] * W5200_W5500_MAX_SOCK_NUM
-
 
 class WIZNET5K:  # pylint: disable=too-many-public-methods
     """Interface for WIZNET5K module.
@@ -139,6 +155,10 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
     :param str hostname: The desired hostname, with optional {} to fill in MAC.
     :param int dhcp_timeout: Timeout in seconds for DHCP response.
     :param bool debug: Enable debugging output.
+    :param ~digitalio.DigitalInOut interrupt: Optional INTn pin, lets waits skip polling.
+    :param list socket_sizes: Optional buffer size in KB of each socket, either one
+        size for RX and TX or a (rx, tx) tuple: 0, 1, 2, 4, 8 (or 16 on the W5500).
+        Missing sockets get 0. Defaults to 2 KB for every socket.
 
     """
 
@@ -157,9 +177,12 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         hostname=None,
         dhcp_timeout=30,
         debug=False,
+        interrupt=None,
+        socket_sizes=None,
     ):
         self._debug = debug
         self._chip_type = None
+        self._max_sockets = -1
         self._device = SPIDevice(spi_bus, cs, baudrate=40000000, polarity=0, phase=0)
         # init c.s.
         self._cs = cs
@@ -173,11 +196,55 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
         # Buffer for reading params from module
         self._pbuff = bytearray(8)
-        self._rxbuf = bytearray(MAX_PACKET)
+        # Scratch for the SPI header (3 bytes) and up to 2 data bytes
+        self._wbuf = bytearray(5)
+        # Socket registers Sn_IR .. Sn_RX_RSR, read in one burst by poll()
+        self._poll_buf = bytearray(REG_SNRX_RSR + 2 - REG_SNIR)
+
+        # Called with the delay while the driver waits on the chip,
+        # replace it to run other work in the meantime
+        self.wait_hook = time.sleep
+        self.wait_max = WAIT_MAX
+
+        # Sockets whose socket_write() streams, see socket_set_stream()
+        self._stream = [False] * W5200_W5500_MAX_SOCK_NUM
+
+        # Resolver cache, least recently used first
+        self.dns_cache_size = DNS_CACHE_SIZE
+        # Return an expired address when the DNS server does not answer
+        self.dns_serve_stale = True
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self._dns_names = []
+        self._dns_ips = []
+        self._dns_expires = []
+
+        # Source ports in use
+        self._src_ports = [0] * W5200_W5500_MAX_SOCK_NUM
+        # UDP datagram being read on each socket: bytes left, sender IP and port
+        self._udp_remaining = [0] * W5200_W5500_MAX_SOCK_NUM
+        self._udp_ip = bytearray(4 * W5200_W5500_MAX_SOCK_NUM)
+        self._udp_port = [0] * W5200_W5500_MAX_SOCK_NUM
+        self._udp_header = bytearray(8)
+        self._udp_last = 0
+
+        # The link state is read again after link_interval seconds or after an error
+        self.link_interval = LINK_INTERVAL
+        self._link = None
+        self._link_stamp = 0
 
         # attempt to initialize the module
-        self._ch_base_msb = 0
+        self._socket_sizes = socket_sizes
         assert self._w5100_init() == 1, "Failed to initialize WIZnet module."
+
+        # INTn is active low, enable the socket interrupts
+        self._interrupt = interrupt
+        if interrupt is not None:
+            interrupt.switch_to_input()
+            if self._chip_type == "w5500":
+                self.write(REG_SIMR_W5500, 0x04, 0xFF)
+            else:
+                self.write(REG_IMR_W5100S, 0x04, 0x0F)
         # Set MAC address
         self.mac_address = mac
         self.src_port = 0
@@ -185,13 +252,9 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
         # First, wait link status is on
         # to avoid the code during DHCP, socket listen, connect ... - assert self.link_status, "Ethernet cable disconnected!"
-        start_time = time.monotonic()
-        while True:
-            if self.link_status or ((time.monotonic() - start_time) > 5):
-                break
-            time.sleep(1)
-            if self._debug:
-                print("My Link is:", self.link_status)
+        self._wait(self._ready_link, 0, time.monotonic() + 5)
+        if self._debug:
+            print("My Link is:", self.link_status)
         self._dhcp_client = None
 
         # Set DHCP
@@ -242,22 +305,97 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
             print("* Get host by name")
         if isinstance(hostname, str):
             hostname = bytes(hostname, "utf-8")
+        now = time.monotonic()
+        try:
+            i = self._dns_names.index(hostname)
+        except ValueError:
+            i = -1
+        if i >= 0 and now < self._dns_expires[i]:
+            self.dns_hits += 1
+            self._dns_touch(i)
+            return self._dns_ips[-1]
+        self.dns_misses += 1
         # Return IP assigned by DHCP
         _dns_client = dns.DNS(self, self._dns, debug=self._debug)
-        ret = _dns_client.gethostbyname(hostname)
+        try:
+            ret = _dns_client.gethostbyname(hostname)
+        except (OSError, RuntimeError):
+            if i < 0 or not self.dns_serve_stale:
+                raise
+            ret = -1
+        if ret == -1 and i >= 0 and self.dns_serve_stale:
+            if self._debug:
+                print("* DNS failed, stale IP: ", self._dns_ips[i])
+            self._dns_touch(i)
+            return self._dns_ips[-1]
         if self._debug:
             print("* Resolved IP: ", ret)
         assert ret != -1, "Failed to resolve hostname!"
+        ttl = self._dns_ttl(getattr(_dns_client, "_pkt_buf", None), ret)
+        if i >= 0:
+            self._dns_touch(i)
+        else:
+            if len(self._dns_names) >= self.dns_cache_size:
+                # evict the least recently used hostname
+                self._dns_names.pop(0)
+                self._dns_ips.pop(0)
+                self._dns_expires.pop(0)
+            self._dns_names.append(hostname)
+            self._dns_ips.append(ret)
+            self._dns_expires.append(0)
+        self._dns_ips[-1] = ret
+        self._dns_expires[-1] = now + ttl
         return ret
 
+    def _dns_touch(self, i):
+        """Moves cache entry i to the most recently used end."""
+        self._dns_names.append(self._dns_names.pop(i))
+        self._dns_ips.append(self._dns_ips.pop(i))
+        self._dns_expires.append(self._dns_expires.pop(i))
+
+    def _dns_ttl(self, packet, ip):
+        """Returns the TTL of the A record for ip in a DNS response,
+        DNS_TTL if the response is not available or has no such record.
+        The compiled DNS client keeps the last response in _pkt_buf.
+        :param bytearray packet: DNS response.
+        :param bytearray ip: Resolved address.
+
+        """
+        # pylint: disable=no-self-use
+        try:
+            # header, then skip the question: name, type, class
+            ptr = 12
+            for _ in range((packet[4] << 8) | packet[5]):
+                while packet[ptr] and packet[ptr] < 0xC0:
+                    ptr += packet[ptr] + 1
+                ptr += 2 if packet[ptr] else 1
+                ptr += 4
+            for _ in range((packet[6] << 8) | packet[7]):
+                while packet[ptr] and packet[ptr] < 0xC0:
+                    ptr += packet[ptr] + 1
+                ptr += 2 if packet[ptr] else 1
+                # type, class, TTL, data length, data
+                length = (packet[ptr + 8] << 8) | packet[ptr + 9]
+                if (
+                    packet[ptr : ptr + 4] == b"\x00\x01\x00\x01"
+                    and packet[ptr + 10 : ptr + 10 + length] == bytes(ip)
+                ):
+                    ttl = (
+                        (packet[ptr + 4] << 24)
+                        | (packet[ptr + 5] << 16)
+                        | (packet[ptr + 6] << 8)
+                        | packet[ptr + 7]
+                    )
+                    return min(ttl, DNS_TTL_MAX)
+                ptr += 10 + length
+        except (TypeError, IndexError):
+            pass
+        return DNS_TTL
+
     @property
     def max_sockets(self):
         """Returns max number of sockets supported by chip."""
-        if self._chip_type == "w5500":
-            return W5200_W5500_MAX_SOCK_NUM
-        elif self._chip_type == "w5100s":
-            return W5100_MAX_SOCK_NUM
-        return -1
+        return self._max_sockets
 
     @property
     def chip(self):
@@ -315,28 +453,28 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         """
         if socket_num >= self.max_sockets:
             return self._pbuff
-        for octet in range(0, 4):
-            self._pbuff[octet] = self._read_socket(socket_num, REG_SNDIPR + octet)[0]
+        self._read_socket_into(socket_num, REG_SNDIPR, self._pbuff, 4)
         return self.pretty_ip(self._pbuff)
 
     @property
     def link_status(self):
-        """ "Returns if the PHY is connected."""
-        if self._chip_type == "w5500":
-            data = self.read(REG_PHYCFGR, 0x00)
-            return data[0] & 0x01
-        elif self._chip_type == "w5100s":
-            data = self.read(REG_PHYCFGR_W5100S, 0x00)
-            return data[0] & 0x01
-        return 0
+        """ "Returns if the PHY is connected.
+        The PHY is read at most every link_interval seconds (0: on every call),
+        and again after a socket error.
+        """
+        now = time.monotonic()
+        if self._link is None or now - self._link_stamp >= self.link_interval:
+            if self._chip_type is None:
+                return 0
+            self._link = self.read(self._phycfgr, 0x00)[0] & 0x01
+            self._link_stamp = now
+        return self._link
 
     def remote_port(self, socket_num):
         """Returns the port of the host who sent the current incoming packet."""
         if socket_num >= self.max_sockets:
             return self._pbuff
-        for octet in range(0, 2):
-            self._pbuff[octet] = self._read_socket(socket_num, REG_SNDPORT + octet)[0]
-        return int((self._pbuff[0] << 8) | self._pbuff[0])
+        return self._read_socket_word(socket_num, REG_SNDPORT)
 
     @property
     def ifconfig(self):
@@ -371,21 +509,116 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         # Detect if chip is Wiznet W5500
         if self.detect_w5500() == 1:
             # perform w5500 initialization
-            for i in range(0, W5200_W5500_MAX_SOCK_NUM):
-                ctrl_byte = 0x0C + (i << 5)
-                self.write(0x1E, ctrl_byte, 2)
-                self.write(0x1F, ctrl_byte, 2)
+            self.set_socket_sizes(self._socket_sizes)
         else:
             # Detect if chip is Wiznet W5100S
             if self.detect_w5100s() == 1:
-                pass
+                self.set_socket_sizes(self._socket_sizes)
             else:
                 return 0
         return 1
 
+    def set_socket_sizes(self, sizes=None):
+        """Programs the RX and TX buffer size of every socket
+        (Sn_RXBUF_SIZE / Sn_TXBUF_SIZE) and the driver's buffer addresses.
+        Only change it while every socket is closed.
+        :param list sizes: Size in KB of each socket, one size for RX and TX
+            or a (rx, tx) tuple. Missing sockets get 0, None is 2 KB each.
+
+        """
+        count = self._max_sockets
+        if self._chip_type == "w5500":
+            memory = SOCK_MEMORY_W5500
+        else:
+            memory = SOCK_MEMORY_W5100S
+        if sizes is None:
+            sizes = [SOCK_SIZE >> 10] * count
+        if len(sizes) > count:
+            raise ValueError("The {} has {} sockets.".format(self._chip_type, count))
+        rx_sizes = [0] * count
+        tx_sizes = [0] * count
+        for sock, size in enumerate(sizes):
+            if isinstance(size, int):
+                size = (size, size)
+            rx_sizes[sock], tx_sizes[sock] = size
+        for size in rx_sizes + tx_sizes:
+            if size not in (0, 1, 2, 4, 8, 16) or size > memory:
+                raise ValueError("Socket buffer sizes are 0, 1, 2, 4, 8 or 16 KB.")
+        if sum(rx_sizes) > memory or sum(tx_sizes) > memory:
+            raise ValueError("Socket buffers exceed the {} KB of the chip.".format(memory))
+
+        rx_base = 0x6000
+        tx_base = 0x4000
+        for sock in range(count):
+            self._write_socket(sock, REG_SNRXBUF_SIZE, rx_sizes[sock])
+            self._write_socket(sock, REG_SNTXBUF_SIZE, tx_sizes[sock])
+            self._rx_size[sock] = rx_sizes[sock] << 10
+            self._tx_size[sock] = tx_sizes[sock] << 10
+            if self._chip_type != "w5500":
+                # W5100S buffers are packed one after the other in socket order
+                self._rx_base[sock] = rx_base
+                self._rx_mask[sock] = self._rx_size[sock] - 1
+                rx_base += self._rx_size[sock]
+                self._tx_base[sock] = tx_base
+                self._tx_mask[sock] = self._tx_size[sock] - 1
+                tx_base += self._tx_size[sock]
+
+    def _select_chip(self, chip_type):
+        """Sets the chip type and picks the chip-specific register access
+        functions and socket addresses, so that register accesses do not
+        compare the chip type on every call.
+        :param str chip_type: "w5500" or "w5100s".
+
+        """
+        self._chip_type = chip_type
+        self._link = None
+        # streamed writes: SEND in flight, bytes written after the last SEND
+        self._tx_busy = [False] * W5200_W5500_MAX_SOCK_NUM
+        self._tx_unsent = [0] * W5200_W5500_MAX_SOCK_NUM
+        if chip_type == "w5500":
+            self._read_into = self._read_into_w5500
+            self.write = self._write_w5500
+            self._write_word = self._write_word_w5500
+            self._max_sockets = W5200_W5500_MAX_SOCK_NUM
+            self._phycfgr = REG_PHYCFGR
+            socks = range(W5200_W5500_MAX_SOCK_NUM)
+            # socket registers: block select in the control byte
+            self._sock_reg = [0 for sock in socks]
+            self._sock_rcntl = [(sock << 5) + 0x08 for sock in socks]
+            self._sock_wcntl = [(sock << 5) + 0x0C for sock in socks]
+            # socket buffers: the chip wraps the 16-bit pointer itself
+            self._rx_base = [0 for sock in socks]
+            self._rx_cntl = [0x18 + (sock << 5) for sock in socks]
+            self._rx_mask = [0xFFFF for sock in socks]
+            self._tx_base = [0 for sock in socks]
+            self._tx_cntl = [0x14 + (sock << 5) for sock in socks]
+            self._tx_mask = [0xFFFF for sock in socks]
+            self._rx_size = [SOCK_SIZE for sock in socks]
+            self._tx_size = [SOCK_SIZE for sock in socks]
+        else:
+            self._read_into = self._read_into_w5100s
+            self.write = self._write_w5100s
+            self._write_word = self._write_word_w5100s
+            self._max_sockets = W5100_MAX_SOCK_NUM
+            self._phycfgr = REG_PHYCFGR_W5100S
+            socks = range(W5100_MAX_SOCK_NUM)
+            # socket registers: flat address space
+            self._sock_reg = [0x0400 + sock * CH_SIZE for sock in socks]
+            self._sock_rcntl = [0 for sock in socks]
+            self._sock_wcntl = [0 for sock in socks]
+            # socket buffers: rings wrapped by the driver, see set_socket_sizes
+            self._rx_base = [0x6000 + sock * SOCK_SIZE for sock in socks]
+            self._rx_cntl = [0 for sock in socks]
+            self._rx_mask = [SOCK_MASK for sock in socks]
+            self._tx_base = [0x4000 + sock * SOCK_SIZE for sock in socks]
+            self._tx_cntl = [0 for sock in socks]
+            self._tx_mask = [SOCK_MASK for sock in socks]
+            self._rx_size = [SOCK_SIZE for sock in socks]
+            self._tx_size = [SOCK_SIZE for sock in socks]
+
     def detect_w5500(self):
         """Detects W5500 chip."""
-        self._chip_type = "w5500"
+        self._select_chip("w5500")
         assert self.sw_reset() == 0, "Chip not reset properly!"
         self._write_mr(0x08)
         # assert self._read_mr()[0] == 0x08, "Expected 0x08."
@@ -401,19 +634,15 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
         if self.read(REG_VERSIONR_W5500, 0x00)[0] != 0x04:
             return -1
-        # self._chip_type = "w5500"
-        # self._ch_base_msb = 0x10
         return 1
 
     def detect_w5100s(self):
         """Detects W5100S chip."""
-        self._chip_type = "w5100s"
+        self._select_chip("w5100s")
         # sw reset
         assert self.sw_reset() == 0, "Chip not reset properly!"
         if self.read(REG_VERSIONR_W5100S, 0x00)[0] != 0x51:
             return -1
-
-        self._ch_base_msb = 0x0400
         return 1
 
     def sw_reset(self):
@@ -447,55 +676,142 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         :param int addr: Register address.
 
         """
+        if buffer is None:
+            buffer = bytearray(length)
+        self._read_into(addr, callback, buffer, 0, length)
+        return buffer
+
+    def _read_into(self, addr, callback, buffer, start, end):
+        """Reads data from a register address into buffer[start:end],
+        without allocating.
+        Replaced by the chip's own version once the chip is detected.
+        :param int addr: Register address.
+        :param int callback: Callback reference.
+        :param bytearray buffer: Destination, bytearray or memoryview.
+        :param int start: First index of buffer to fill.
+        :param int end: Index after the last one to fill.
+
+        """
+        if self._chip_type == "w5500":
+            return self._read_into_w5500(addr, callback, buffer, start, end)
+        return self._read_into_w5100s(addr, callback, buffer, start, end)
+
+    def _read_into_w5500(self, addr, callback, buffer, start, end):
+        wbuf = self._wbuf
+        wbuf[0] = addr >> 8
+        wbuf[1] = addr & 0xFF
+        wbuf[2] = callback
         with self._device as bus_device:
-            if self._chip_type == "w5500":
-                bus_device.write(bytes([addr >> 8]))  # pylint: disable=no-member
-                bus_device.write(bytes([addr & 0xFF]))  # pylint: disable=no-member
-                bus_device.write(bytes([callback]))  # pylint: disable=no-member
-            else :
-            #if self._chip_type == "w5100s":
-                bus_device.write(bytes([0x0F]))  # pylint: disable=no-member
-                bus_device.write(bytes([addr >> 8]))  # pylint: disable=no-member
-                bus_device.write(bytes([addr & 0xFF]))  # pylint: disable=no-member
-
-            if buffer is None:
-                self._rxbuf = bytearray(length)
-                bus_device.readinto(self._rxbuf)  # pylint: disable=no-member
-                return self._rxbuf
-            bus_device.readinto(buffer, end=length)  # pylint: disable=no-member
-            return buffer
+            bus_device.write(wbuf, end=3)  # pylint: disable=no-member
+            bus_device.readinto(buffer, start=start, end=end)  # pylint: disable=no-member
+
+    def _read_into_w5100s(self, addr, callback, buffer, start, end):  # pylint: disable=unused-argument
+        wbuf = self._wbuf
+        wbuf[0] = 0x0F
+        wbuf[1] = addr >> 8
+        wbuf[2] = addr & 0xFF
+        with self._device as bus_device:
+            bus_device.write(wbuf, end=3)  # pylint: disable=no-member
+            bus_device.readinto(buffer, start=start, end=end)  # pylint: disable=no-member
 
     def write(self, addr, callback, data):
         """Write data to a register address.
+        The header comes from a preallocated scratch buffer and the payload
+        is sent in a single burst, so nothing is allocated per byte.
+        Replaced by the chip's own version once the chip is detected.
         :param int addr: Destination address.
         :param int callback: Callback reference.
         :param int data: Data to write, as an integer.
-        :param bytearray data: Data to write, as a bytearray.
+        :param bytearray data: Data to write, as a bytearray or memoryview.
 
         """
+        if self._chip_type == "w5500":
+            return self._write_w5500(addr, callback, data)
+        return self._write_w5100s(addr, callback, data)
+
+    def _write_w5500(self, addr, callback, data):
+        wbuf = self._wbuf
+        wbuf[0] = addr >> 8
+        wbuf[1] = addr & 0xFF
+        wbuf[2] = callback
+        self._write_payload(data)
+
+    def _write_w5100s(self, addr, callback, data):  # pylint: disable=unused-argument
+        wbuf = self._wbuf
+        wbuf[0] = 0xF0
+        wbuf[1] = addr >> 8
+        wbuf[2] = addr & 0xFF
+        self._write_payload(data)
+
+    def _write_payload(self, data):
+        """Sends the header in the scratch buffer followed by data."""
+        wbuf = self._wbuf
         with self._device as bus_device:
-            if self._chip_type == "w5500":
-                bus_device.write(bytes([addr >> 8]))  # pylint: disable=no-member
-                bus_device.write(bytes([addr & 0xFF]))  # pylint: disable=no-member
-                bus_device.write(bytes([callback]))  # pylint: disable=no-member
-            else :
-            #if self._chip_type == "w5100s":
-                bus_device.write(bytes([0xF0]))  # pylint: disable=no-member
-                bus_device.write(bytes([addr >> 8]))  # pylint: disable=no-member
-                bus_device.write(bytes([addr & 0xFF]))  # pylint: disable=no-member
-
             if hasattr(data, "from_bytes"):
-                bus_device.write(bytes([data]))  # pylint: disable=no-member
-            else:
-                for i, _ in enumerate(data):
-                    bus_device.write(bytes([data[i]]))  # pylint: disable=no-member
+                # single byte register: header and data in one transfer
+                wbuf[3] = data
+                bus_device.write(wbuf, end=4)  # pylint: disable=no-member
+                return
+            bus_device.write(wbuf, end=3)  # pylint: disable=no-member
+            if not isinstance(data, (bytes, bytearray, memoryview)):
+                # tuple / list (MAC, IP address)
+                data = bytes(data)
+            bus_device.write(data)  # pylint: disable=no-member
+
+    def _write_word(self, addr, callback, data):
+        """Write a 16-bit value, MSB first, to two contiguous registers
+        in a single transfer.
+        Replaced by the chip's own version once the chip is detected.
+        :param int addr: Destination address.
+        :param int callback: Callback reference.
+        :param int data: Data to write, as an integer.
+
+        """
+        if self._chip_type == "w5500":
+            return self._write_word_w5500(addr, callback, data)
+        return self._write_word_w5100s(addr, callback, data)
+
+    def _write_word_w5500(self, addr, callback, data):
+        wbuf = self._wbuf
+        wbuf[0] = addr >> 8
+        wbuf[1] = addr & 0xFF
+        wbuf[2] = callback
+        wbuf[3] = data >> 8 & 0xFF
+        wbuf[4] = data & 0xFF
+        with self._device as bus_device:
+            bus_device.write(wbuf, end=5)  # pylint: disable=no-member
+
+    def _write_word_w5100s(self, addr, callback, data):  # pylint: disable=unused-argument
+        wbuf = self._wbuf
+        wbuf[0] = 0xF0
+        wbuf[1] = addr >> 8
+        wbuf[2] = addr & 0xFF
+        wbuf[3] = data >> 8 & 0xFF
+        wbuf[4] = data & 0xFF
+        with self._device as bus_device:
+            bus_device.write(wbuf, end=5)  # pylint: disable=no-member
 
     # Socket-Register API
-    def udp_remaining(self):
-        """Returns amount of bytes remaining in a udp socket."""
+    def udp_remaining(self, socket_num=None):
+        """Returns amount of bytes remaining in a udp socket.
+        :param int socket_num: Desired socket, defaults to the socket
+            whose datagram header was read last.
+
+        """
+        if socket_num is None:
+            socket_num = self._udp_last
         if self._debug:
-            print("* UDP Bytes Remaining: ", UDP_SOCK["bytes_remaining"])
-        return UDP_SOCK["bytes_remaining"]
+            print("* UDP Bytes Remaining: ", self._udp_remaining[socket_num])
+        return self._udp_remaining[socket_num]
+
+    def udp_remote(self, socket_num):
+        """Returns the sender (IP address, port) of the datagram being read
+        on a UDP socket.
+        :param int socket_num: Desired socket.
+
+        """
+        ip = memoryview(self._udp_ip)[socket_num * 4 : socket_num * 4 + 4]
+        return self.pretty_ip(ip), self._udp_port[socket_num]
 
     def socket_available(self, socket_num, sock_type=SNMR_TCP):
         """Returns the amount of bytes to be read from the socket.
@@ -511,21 +827,25 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
             )
         assert socket_num <= self.max_sockets, "Provided socket exceeds max_sockets."
 
+        if self._tx_busy[socket_num] or self._tx_unsent[socket_num]:
+            # a request may be waiting in the TX buffer for its SEND
+            self._tx_service(socket_num)
         res = self._get_rx_rcv_size(socket_num)
 
         if sock_type == SNMR_TCP:
             return res
         if res > 0:
-            if UDP_SOCK["bytes_remaining"]:
-                return UDP_SOCK["bytes_remaining"]
+            if self._udp_remaining[socket_num]:
+                return self._udp_remaining[socket_num]
             # parse the udp rx packet
             # read the first 8 header bytes
-            ret, self._pbuff = self.socket_read(socket_num, 8)
-            if ret > 0:
-                UDP_SOCK["remote_ip"] = self._pbuff[:4]
-                UDP_SOCK["remote_port"] = (self._pbuff[4] << 8) + self._pbuff[5]
-                UDP_SOCK["bytes_remaining"] = (self._pbuff[6] << 8) + self._pbuff[7]
-                ret = UDP_SOCK["bytes_remaining"]
+            header = self._udp_header
+            if self.socket_recv_into(socket_num, header, 8) == 8:
+                self._udp_ip[socket_num * 4 : socket_num * 4 + 4] = header[:4]
+                self._udp_port[socket_num] = (header[4] << 8) + header[5]
+                ret = (header[6] << 8) + header[7]
+                self._udp_remaining[socket_num] = ret
+                self._udp_last = socket_num
                 return ret
         return 0
 
@@ -561,22 +881,141 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         self._send_socket_cmd(socket_num, CMD_SOCK_CONNECT)
 
         if conn_mode == SNMR_TCP:
-            # wait for tcp connection establishment
-            while self.socket_status(socket_num)[0] != SNSR_SOCK_ESTABLISHED:
-                time.sleep(0.001)
-                if self._debug:
-                    print("SN_SR:", self.socket_status(socket_num)[0])
-                if self.socket_status(socket_num)[0] == SNSR_SOCK_CLOSED:
-                    raise RuntimeError("Failed to establish connection.")
+            # wait for tcp connection establishment, the chip closes the socket on timeout
+            if not self._wait(self._ready_connect, socket_num, irq=True):
+                self._link = None
+                raise RuntimeError("Failed to establish connection.")
+            self._write_snir(socket_num, SNIR_CON)
         elif conn_mode == SNMR_UDP:
-            UDP_SOCK["bytes_remaining"] = 0
+            self._udp_remaining[socket_num] = 0
         return 1
 
     def _send_socket_cmd(self, socket, cmd):
         self._write_sncr(socket, cmd)
-        while self._read_sncr(socket) != b"\x00":
-            if self._debug:
-                print("waiting for sncr to clear...")
+        if self._wait(self._ready_cmd, socket, time.monotonic() + CMD_TIMEOUT) is None:
+            self._link = None
+            raise RuntimeError("Socket command timed out.")
+
+    def _wait(self, ready, sock, deadline=0, irq=False):
+        """Waits until ready(sock) returns something else than None.
+        ready is polled at once, then after delays doubling from WAIT_MIN
+        up to wait_max. The delays are spent in wait_hook.
+        With irq=True and an INTn pin, ready is only polled when the chip
+        signals an interrupt, or every WAIT_IRQ_POLL seconds.
+        Returns the result of ready, None if the deadline has passed.
+        :param ready: Method taking the socket number.
+        :param int sock: Socket number.
+        :param float deadline: time.monotonic() to give up at, 0 for no deadline.
+        :param bool irq: Whether the awaited event raises a socket interrupt.
+
+        """
+        pin = self._interrupt if irq else None
+        delay = WAIT_MIN
+        polled = time.monotonic() - WAIT_IRQ_POLL
+        while True:
+            now = time.monotonic()
+            if pin is None or not pin.value or now - polled >= WAIT_IRQ_POLL:
+                polled = now
+                result = ready(sock)
+                if result is not None:
+                    return result
+            if deadline and now > deadline:
+                return None
+            # do not sleep past the deadline
+            self.wait_hook(min(delay, deadline - now) if deadline else delay)
+            delay = min(delay * 2, self.wait_max)
+
+    def _ready_cmd(self, sock):
+        """The chip has accepted the socket command."""
+        return True if self._read_sncr(sock)[0] == 0 else None
+
+    def _ready_link(self, sock):  # pylint: disable=unused-argument
+        """The PHY link is up."""
+        self._link = None
+        return True if self.link_status else None
+
+    def _ready_connect(self, sock):
+        """TCP connection established (True) or failed (False)."""
+        status = self._read_snsr(sock)[0]
+        if status == SNSR_SOCK_ESTABLISHED:
+            return True
+        if status == SNSR_SOCK_CLOSED:
+            return False
+        return None
+
+    def _ready_listen(self, sock):
+        """Socket listening (True) or closed (False)."""
+        status = self._read_snsr(sock)[0]
+        if status in (SNSR_SOCK_LISTEN, SNSR_SOCK_ESTABLISHED, SNSR_SOCK_UDP):
+            return True
+        if status == SNSR_SOCK_CLOSED:
+            return False
+        return None
+
+    def _ready_send(self, sock):
+        """Data sent (True) or connection lost (False)."""
+        if self._read_socket(sock, REG_SNIR)[0] & SNIR_SEND_OK:
+            return True
+        if self._read_snsr(sock)[0] in (
+            SNSR_SOCK_CLOSED,
+            SNSR_SOCK_TIME_WAIT,
+            SNSR_SOCK_FIN_WAIT,
+            SNSR_SOCK_CLOSE_WAIT,
+            SNSR_SOCK_CLOSING,
+        ):
+            return False
+        return None
+
+    def poll(self, sockets, timeout=0):
+        """Reports which sockets are ready, without blocking on any of them.
+        Sn_IR, Sn_SR, Sn_TX_FSR and Sn_RX_RSR of each socket are read
+        in a single burst.
+        Returns three lists of socket numbers: readable (data waiting),
+        writable (connected with free TX space) and closed (closed,
+        closing or disconnected by the peer).
+        :param list sockets: Socket numbers to check.
+        :param float timeout: Seconds to wait for a socket to be ready,
+            0 to check once, None to wait until one is.
+
+        """
+        if timeout == 0:
+            return self._poll_sockets(sockets) or ([], [], [])
+        deadline = time.monotonic() + timeout if timeout else 0
+        return self._wait(self._poll_sockets, sockets, deadline) or ([], [], [])
+
+    def _poll_sockets(self, sockets):
+        """One pass of poll(), None if no socket is ready."""
+        buf = self._poll_buf
+        readable = []
+        writable = []
+        closed = []
+        for sock in sockets:
+            if self._tx_busy[sock] or self._tx_unsent[sock]:
+                self._tx_service(sock)
+            self._read_socket_into(sock, REG_SNIR, buf, len(buf))
+            status = buf[REG_SNSR - REG_SNIR]
+            if status in (
+                SNSR_SOCK_CLOSED,
+                SNSR_SOCK_CLOSE_WAIT,
+                SNSR_SOCK_FIN_WAIT,
+                SNSR_SOCK_CLOSING,
+                SNSR_SOCK_TIME_WAIT,
+                SNSR_SOCK_LAST_ACK,
+            ) or buf[0] & (SNIR_DISCON | SNIR_TIMEOUT):
+                closed.append(sock)
+            i = REG_SNRX_RSR - REG_SNIR
+            if buf[i] or buf[i + 1]:
+                readable.append(sock)
+            i = REG_SNTX_FSR - REG_SNIR
+            if (buf[i] or buf[i + 1]) and status in (
+                SNSR_SOCK_ESTABLISHED,
+                SNSR_SOCK_CLOSE_WAIT,
+                SNSR_SOCK_UDP,
+            ):
+                writable.append(sock)
+        if readable or writable or closed:
+            return readable, writable, closed
+        return None
 
     def get_socket(self):
         """Requests, allocates and returns a socket from the W5k
@@ -587,6 +1026,9 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
         sock = SOCKET_INVALID
         for _sock in range(self.max_sockets):
+            if not (self._rx_size[_sock] and self._tx_size[_sock]):
+                # no buffer memory given to this socket
+                continue
             status = self.socket_status(_sock)[0]
             if status == SNSR_SOCK_CLOSED:
                 sock = _sock
@@ -618,11 +1060,8 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         # Send listen command
         self._send_socket_cmd(socket_num, CMD_SOCK_LISTEN)
         # Wait until ready
-        status = [SNSR_SOCK_CLOSED]
-        while status[0] not in (SNSR_SOCK_LISTEN, SNSR_SOCK_ESTABLISHED, SNSR_SOCK_UDP):
-            status = self._read_snsr(socket_num)
-            if status[0] == SNSR_SOCK_CLOSED:
-                raise RuntimeError("Listening socket closed.")
+        if not self._wait(self._ready_listen, socket_num):
+            raise RuntimeError("Listening socket closed.")
 
     def socket_accept(self, socket_num):
         """Gets the dest IP and port from an incoming connection.
@@ -662,20 +1101,30 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
             self._write_snmr(socket_num, conn_mode)
             self._write_snir(socket_num, 0xFF)
+            self._tx_busy[socket_num] = False
+            self._tx_unsent[socket_num] = 0
+            self._udp_remaining[socket_num] = 0
+            self._stream[socket_num] = False
+            if self._interrupt is not None:
+                # RECV is left out, nothing waits on it and it is never cleared
+                self._write_socket(
+                    socket_num,
+                    REG_SNIMR,
+                    SNIR_SEND_OK | SNIR_TIMEOUT | SNIR_DISCON | SNIR_CON,
+                )
 
             if self.src_port > 0:
                 # write to socket source port
                 self._write_sock_port(socket_num, self.src_port)
             else:
                 s_port = randint(49152, 65535)
-                while s_port in SRC_PORTS:
+                while s_port in self._src_ports:
                     s_port = randint(49152, 65535)
                 self._write_sock_port(socket_num, s_port)
-                SRC_PORTS[socket_num] = s_port
+                self._src_ports[socket_num] = s_port
 
             # open socket
-            self._write_sncr(socket_num, CMD_SOCK_OPEN)
-            self._read_sncr(socket_num)
+            self._send_socket_cmd(socket_num, CMD_SOCK_OPEN)
             assert (
                 self._read_snsr((socket_num))[0] == 0x13
                 or self._read_snsr((socket_num))[0] == 0x22
@@ -687,15 +1136,21 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         """Closes a socket."""
         if self._debug:
             print("*** Closing socket #%d" % socket_num)
-        self._write_sncr(socket_num, CMD_SOCK_CLOSE)
-        self._read_sncr(socket_num)
+        if self._tx_busy[socket_num] or self._tx_unsent[socket_num]:
+            self.socket_flush(socket_num, CMD_TIMEOUT)
+        self._tx_busy[socket_num] = False
+        self._tx_unsent[socket_num] = 0
+        self._udp_remaining[socket_num] = 0
+        self._src_ports[socket_num] = 0
+        self._send_socket_cmd(socket_num, CMD_SOCK_CLOSE)
 
     def socket_disconnect(self, socket_num):
         """Disconnect a TCP connection."""
         if self._debug:
             print("*** Disconnecting socket #%d" % socket_num)
-        self._write_sncr(socket_num, CMD_SOCK_DISCON)
-        self._read_sncr(socket_num)
+        if self._tx_busy[socket_num] or self._tx_unsent[socket_num]:
+            self.socket_flush(socket_num, CMD_TIMEOUT)
+        self._send_socket_cmd(socket_num, CMD_SOCK_DISCON)
 
     def socket_read(self, socket_num, length):
         """Reads data from a socket into a buffer.
@@ -727,188 +1182,298 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
         if ret > 0:
             if self._debug:
                 print("\t * Processing {} bytes of data".format(ret))
-            # Read the starting save address of the received data
-            ptr = self._read_snrx_rd(socket_num)
-
-            if self._chip_type == "w5500":
-                # Read data from the starting address of snrx_rd
-                ctrl_byte = 0x18 + (socket_num << 5)
-
-                resp = self.read(ptr, ctrl_byte, ret)
-            else :
-            #if self._chip_type == "w5100s":
-                offset = ptr & SOCK_MASK
-                src_addr = offset + (socket_num * SOCK_SIZE + 0x6000)
-                if (offset + ret > SOCK_SIZE) :
-                    size = SOCK_SIZE - offset
-                    resp1 = self.read(src_addr, 0x00, size)
-                    size = ret - size
-                    src_addr = (socket_num * SOCK_SIZE + 0x6000)
-                    resp2 = self.read(src_addr, 0x00, size)
-                    resp = resp1 + resp2
-                else :
-                    resp = self.read(src_addr, 0x00, ret)
-
-            #  After reading the received data, update Sn_RX_RD to the increased
-            # value as many as the reading size.
-            ptr = (ptr + ret) & 0xFFFF
-            self._write_snrx_rd(socket_num, ptr)
-
-            # Notify the W5k of the updated Sn_Rx_RD
-            self._write_sncr(socket_num, CMD_SOCK_RECV)
-            self._read_sncr(socket_num)
+            resp = bytearray(ret)
+            self._socket_read_into(socket_num, resp, ret)
         return ret, resp
 
+    def socket_recv_into(self, socket_num, buffer, nbytes=0):
+        """Reads data from a socket straight into a caller-provided buffer,
+        without allocating. Returns the number of bytes read,
+        0 if no data is waiting.
+        :param int socket_num: Desired socket.
+        :param bytearray buffer: Destination, bytearray or memoryview.
+        :param int nbytes: Maximum number of bytes to read, defaults to len(buffer).
+
+        """
+        assert self.link_status, "Ethernet cable disconnected!"
+        assert socket_num <= self.max_sockets, "Provided socket exceeds max_sockets."
+
+        ret = self._get_rx_rcv_size(socket_num)
+        length = nbytes or len(buffer)
+        if ret > length:
+            ret = length
+        if ret > 0:
+            self._socket_read_into(socket_num, buffer, ret)
+        return ret
+
+    def _socket_read_into(self, socket_num, buffer, ret):
+        """Copies ret bytes from the socket's RX buffer into buffer[:ret]
+        and tells the chip they have been read.
+        On the W5100S the RX ring wrap is read with two transfers at offsets.
+
+        """
+        # Read the starting save address of the received data
+        ptr = self._read_snrx_rd(socket_num)
+
+        mask = self._rx_mask[socket_num]
+        offset = ptr & mask
+        src_addr = self._rx_base[socket_num] + offset
+        cntl_byte = self._rx_cntl[socket_num]
+        if (offset + ret > mask + 1) :
+            size = mask + 1 - offset
+            self._read_into(src_addr, cntl_byte, buffer, 0, size)
+            src_addr = self._rx_base[socket_num]
+            self._read_into(src_addr, cntl_byte, buffer, size, ret)
+        else :
+            self._read_into(src_addr, cntl_byte, buffer, 0, ret)
+
+        #  After reading the received data, update Sn_RX_RD to the increased
+        # value as many as the reading size.
+        ptr = (ptr + ret) & 0xFFFF
+        self._write_snrx_rd(socket_num, ptr)
+
+        # Notify the W5k of the updated Sn_Rx_RD
+        self._send_socket_cmd(socket_num, CMD_SOCK_RECV)
+
     def read_udp(self, socket_num, length):
         """Read UDP socket's remaining bytes."""
-        if UDP_SOCK["bytes_remaining"] > 0:
-            if UDP_SOCK["bytes_remaining"] <= length:
-                ret, resp = self.socket_read(socket_num, UDP_SOCK["bytes_remaining"])
+        remaining = self._udp_remaining[socket_num]
+        if remaining > 0:
+            if remaining <= length:
+                ret, resp = self.socket_read(socket_num, remaining)
             else:
                 ret, resp = self.socket_read(socket_num, length)
             if ret > 0:
-                UDP_SOCK["bytes_remaining"] -= ret
+                self._udp_remaining[socket_num] = remaining - ret
             return ret, resp
         return -1
 
+    def socket_set_stream(self, socket_num, stream=True):
+        """Makes socket_write() on an open TCP socket stream (see socket_stream)
+        instead of waiting for the SEND_OK of every write.
+        UDP sockets cannot stream: every write is one datagram, and the
+        writes queued while a SEND is in flight would go out as one.
+        Opening the socket again turns streaming off.
+        :param int socket_num: Desired socket.
+        :param bool stream: True to stream, False to wait for every SEND_OK.
+
+        """
+        assert socket_num <= self.max_sockets, "Provided socket exceeds max_sockets."
+        if stream and self._read_snmr(socket_num)[0] & 0x0F != SNMR_TCP & 0x0F:
+            raise ValueError("Only TCP sockets can stream.")
+        self._stream[socket_num] = stream
+
     def socket_write(self, socket_num, buffer, timeout=0):
         """Writes a bytearray to a provided socket."""
+        if self._stream[socket_num]:
+            return self.socket_stream(socket_num, buffer, timeout)
         assert self.link_status, "Ethernet cable disconnected!"
         assert socket_num <= self.max_sockets, "Provided socket exceeds max_sockets."
-        status = 0
         ret = 0
-        free_size = 0
-        if len(buffer) > SOCK_SIZE:
-            ret = SOCK_SIZE
+        if len(buffer) > self._tx_size[socket_num]:
+            ret = self._tx_size[socket_num]
         else:
             ret = len(buffer)
-        stamp = time.monotonic()
+        deadline = time.monotonic() + timeout if timeout else 0
+
+        if self._tx_busy[socket_num] or self._tx_unsent[socket_num]:
+            # finish what was streamed before, one SEND at a time
+            if not self.socket_flush(socket_num, timeout):
+                return 0
 
         # if buffer is available, start the transfer
-        free_size = self._get_tx_free_size(socket_num)
-        while free_size < ret:
-            free_size = self._get_tx_free_size(socket_num)
-            status = self.socket_status(socket_num)[0]
-            if status not in (SNSR_SOCK_ESTABLISHED, SNSR_SOCK_CLOSE_WAIT) or (
-                timeout and time.monotonic() - stamp > timeout
-            ):
-                ret = 0
-                break
+        if self._get_tx_free_size(socket_num) < ret:
+            need = ret
+
+            def tx_ready(sock):
+                if self._get_tx_free_size(sock) >= need:
+                    return True
+                if self.socket_status(sock)[0] not in (
+                    SNSR_SOCK_ESTABLISHED,
+                    SNSR_SOCK_CLOSE_WAIT,
+                ):
+                    return False
+                return None
+
+            if not self._wait(tx_ready, socket_num, deadline):
+                self._link = None
+                return 0
+
+        self._write_tx(socket_num, buffer, ret)
+
+        self._send_socket_cmd(socket_num, CMD_SOCK_SEND)
+
+        # check data was  transferred correctly
+        if not self._wait(self._ready_send, socket_num, deadline, irq=True):
+            # self.socket_close(socket_num)
+            self._link = None
+            return 0
+
+        self._write_snir(socket_num, SNIR_SEND_OK)
+        return ret
+
+    def socket_stream(self, socket_num, buffer, timeout=0):
+        """Writes a bytearray to a provided socket without waiting for SEND_OK.
+        The data goes into the free TX space while the previous SEND is
+        still in flight, and is sent as soon as that SEND completes
+        (next socket_stream, socket_available, poll or socket_flush call).
+        Only waits when the TX buffer has no room for the whole write:
+        like socket_write, the write is never cut short, since callers
+        such as socket.send and MiniMQTT ignore the count.
+        Returns the number of bytes queued (at most the TX buffer size),
+        0 on timeout or closed connection.
+        TCP only, queued UDP writes would be sent as one datagram.
+        :param int socket_num: Desired socket.
+        :param bytearray buffer: Data to send.
+        :param float timeout: Seconds to wait for TX space, 0 for no limit.
 
+        """
+        assert self.link_status, "Ethernet cable disconnected!"
+        assert socket_num <= self.max_sockets, "Provided socket exceeds max_sockets."
+        ret = min(len(buffer), self._tx_size[socket_num])
+        deadline = time.monotonic() + timeout if timeout else 0
+
+        if self._tx_service(socket_num) is False:
+            self._link = None
+            return 0
+        if self._get_tx_free_size(socket_num) - self._tx_unsent[socket_num] < ret:
+            need = ret
+
+            def tx_room(sock):
+                # room frees up as the SENDs in flight complete
+                if self._tx_service(sock) is False:
+                    return False
+                if self._get_tx_free_size(sock) - self._tx_unsent[sock] >= need:
+                    return True
+                return None
+
+            if not self._wait(tx_room, socket_num, deadline, irq=True):
+                self._link = None
+                return 0
+
+        self._write_tx(socket_num, buffer, ret)
+        self._tx_unsent[socket_num] += ret
+        # sent right away unless a SEND is in flight
+        if self._tx_service(socket_num) is False:
+            self._link = None
+            return 0
+        return ret
+
+    def socket_flush(self, socket_num, timeout=0):
+        """Sends what socket_stream has queued and waits for the last SEND_OK.
+        Returns True once everything is sent, False on timeout or closed connection.
+        :param int socket_num: Desired socket.
+        :param float timeout: Seconds to wait, 0 for no limit.
+
+        """
+        deadline = time.monotonic() + timeout if timeout else 0
+        if self._wait(self._ready_flushed, socket_num, deadline, irq=True):
+            return True
+        self._link = None
+        return False
+
+    def _write_tx(self, socket_num, buffer, ret):
+        """Copies buffer[:ret] at Sn_TX_WR and moves Sn_TX_WR past it."""
         # Read the starting address for saving the transmitting data.
         ptr = self._read_sntx_wr(socket_num)
-        offset = ptr & SOCK_MASK
-        if self._chip_type == "w5500":
-            dst_addr = offset + (socket_num * SOCK_SIZE + 0x8000)
-    
-            txbuf = buffer[:ret]
-            cntl_byte = 0x14 + (socket_num << 5)
-            self.write(dst_addr, cntl_byte, txbuf)
-            
+        mask = self._tx_mask[socket_num]
+        offset = ptr & mask
+        dst_addr = self._tx_base[socket_num] + offset
+        cntl_byte = self._tx_cntl[socket_num]
+        # slices of a memoryview do not copy the payload
+        txbuf = memoryview(buffer)
+        if (offset + ret > mask + 1) :
+            size = mask + 1 - offset
+            self.write(dst_addr, cntl_byte, txbuf[0:size])
+            dst_addr = self._tx_base[socket_num]
+            self.write(dst_addr, cntl_byte, txbuf[size:ret])
         else :
-        #if self._chip_type == "w5100s":
-            dst_addr = offset + (socket_num * SOCK_SIZE + 0x4000)
-    
-            if (offset + ret > SOCK_SIZE) :
-                size = SOCK_SIZE - offset
-                txbuf = buffer[0:size]
-                self.write(dst_addr, 0x00, txbuf)
-                txbuf = buffer[size:ret]
-                size = ret - size
-                dst_addr = (socket_num * SOCK_SIZE + 0x4000)
-                self.write(dst_addr, 0x00, txbuf)
-            else :
-                txbuf = buffer[:ret]
-                self.write(dst_addr, 0x00, buffer[:ret])
+            self.write(dst_addr, cntl_byte, txbuf[:ret])
 
         # update sn_tx_wr to the value + data size
         ptr = (ptr + ret) & 0xFFFF
         self._write_sntx_wr(socket_num, ptr)
 
-        self._write_sncr(socket_num, CMD_SOCK_SEND)
-        self._read_sncr(socket_num)
-
-        # check data was  transferred correctly
-        while (
-            self._read_socket(socket_num, REG_SNIR)[0] & SNIR_SEND_OK
-        ) != SNIR_SEND_OK:
-            if (
-                self.socket_status(socket_num)[0]
-                in (
-                    SNSR_SOCK_CLOSED,
-                    SNSR_SOCK_TIME_WAIT,
-                    SNSR_SOCK_FIN_WAIT,
-                    SNSR_SOCK_CLOSE_WAIT,
-                    SNSR_SOCK_CLOSING,
-                )
-                or (timeout and time.monotonic() - stamp > timeout)
-            ):
-                # self.socket_close(socket_num)
-                return 0
-            time.sleep(0.01)
-
-        self._write_snir(socket_num, SNIR_SEND_OK)
-        return ret
+    def _tx_service(self, sock):
+        """Moves a streamed socket along: collects the SEND_OK of the SEND
+        in flight, then sends the data queued meanwhile.
+        Returns the _ready_send result of the SEND in flight:
+        True when there was none or it completed, False if the connection is lost,
+        None while it is still in flight.
+        """
+        done = True
+        if self._tx_busy[sock]:
+            done = self._ready_send(sock)
+            if not done:
+                return done
+            self._write_snir(sock, SNIR_SEND_OK)
+            self._tx_busy[sock] = False
+        if self._tx_unsent[sock]:
+            self._send_socket_cmd(sock, CMD_SOCK_SEND)
+            self._tx_busy[sock] = True
+            self._tx_unsent[sock] = 0
+        return done
+
+    def _ready_flushed(self, sock):
+        """Everything streamed is sent (True) or connection lost (False)."""
+        done = self._tx_service(sock)
+        if done and self._tx_busy[sock]:
+            # queued data has just been sent, wait for its SEND_OK
+            return None
+        return done
 
     # Socket-Register Methods
 
     def _get_rx_rcv_size(self, sock):
-        """Get size of recieved and saved in socket buffer."""
-        val = 0
-        val_1 = self._read_snrx_rsr(sock)
-        while val != val_1:
+        """Get size of recieved and saved in socket buffer.
+        The chip may update the register while it is read,
+        so it is read until two reads agree.
+        """
+        val = self._read_snrx_rsr(sock)
+        while val:
             val_1 = self._read_snrx_rsr(sock)
-            if val_1 != 0:
-                val = self._read_snrx_rsr(sock)
-        return int.from_bytes(val, "b")
+            if val_1 == val:
+                break
+            val = val_1
+        return val
 
     def _get_tx_free_size(self, sock):
-        """Get free size of sock's tx buffer block."""
-        val = 0
-        val_1 = self._read_sntx_fsr(sock)
-        while val != val_1:
+        """Get free size of sock's tx buffer block.
+        Read until two reads agree, like _get_rx_rcv_size.
+        """
+        val = self._read_sntx_fsr(sock)
+        while val:
             val_1 = self._read_sntx_fsr(sock)
-            if val_1 != 0:
-                val = self._read_sntx_fsr(sock)
-        return int.from_bytes(val, "b")
+            if val_1 == val:
+                break
+            val = val_1
+        return val
 
     def _read_snrx_rd(self, sock):
-        self._pbuff[0] = self._read_socket(sock, REG_SNRX_RD)[0]
-        self._pbuff[1] = self._read_socket(sock, REG_SNRX_RD + 1)[0]
-        return self._pbuff[0] << 8 | self._pbuff[1]
+        return self._read_socket_word(sock, REG_SNRX_RD)
 
     def _write_snrx_rd(self, sock, data):
-        self._write_socket(sock, REG_SNRX_RD, data >> 8 & 0xFF)
-        self._write_socket(sock, REG_SNRX_RD + 1, data & 0xFF)
+        self._write_socket_word(sock, REG_SNRX_RD, data)
 
     def _write_sntx_wr(self, sock, data):
-        self._write_socket(sock, REG_SNTX_WR, data >> 8 & 0xFF)
-        self._write_socket(sock, REG_SNTX_WR + 1, data & 0xFF)
+        self._write_socket_word(sock, REG_SNTX_WR, data)
 
     def _read_sntx_wr(self, sock):
-        self._pbuff[0] = self._read_socket(sock, 0x0024)[0]
-        self._pbuff[1] = self._read_socket(sock, 0x0024 + 1)[0]
-        return self._pbuff[0] << 8 | self._pbuff[1]
+        return self._read_socket_word(sock, REG_SNTX_WR)
 
     def _read_sntx_fsr(self, sock):
-        data = self._read_socket(sock, REG_SNTX_FSR)
-        data += self._read_socket(sock, REG_SNTX_FSR + 1)
-        return data
+        return self._read_socket_word(sock, REG_SNTX_FSR)
 
     def _read_snrx_rsr(self, sock):
-        data = self._read_socket(sock, REG_SNRX_RSR)
-        data += self._read_socket(sock, REG_SNRX_RSR + 1)
-        return data
+        return self._read_socket_word(sock, REG_SNRX_RSR)
 
     def _write_sndipr(self, sock, ip_addr):
         """Writes to socket destination IP Address."""
-        for octet in range(0, 4):
-            self._write_socket(sock, REG_SNDIPR + octet, ip_addr[octet])
+        self._write_socket(sock, REG_SNDIPR, ip_addr[:4])
 
     def _write_sndport(self, sock, port):
         """Writes to socket destination port."""
-        self._write_socket(sock, REG_SNDPORT, port >> 8)
-        self._write_socket(sock, REG_SNDPORT + 1, port & 0xFF)
+        self._write_socket_word(sock, REG_SNDPORT, port)
 
     def _read_snsr(self, sock):
         """Reads Socket n Status Register."""
@@ -924,8 +1489,7 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
     def _write_sock_port(self, sock, port):
         """Write to the socket port number."""
-        self._write_socket(sock, REG_SNPORT, port >> 8)
-        self._write_socket(sock, REG_SNPORT + 1, port & 0xFF)
+        self._write_socket_word(sock, REG_SNPORT, port)
 
     def _write_sncr(self, sock, data):
         self._write_socket(sock, REG_SNCR, data)
@@ -938,20 +1502,21 @@ class WIZNET5K:  # pylint: disable=too-many-public-methods
 
     def _write_socket(self, sock, address, data):
         """Write to a W5k socket register."""
-        if self._chip_type == "w5500":
-            cntl_byte = (sock << 5) + 0x0C
-            return self.write(address, cntl_byte, data)
-        else :
-        #if self._chip_type == "w5100s":
-            cntl_byte = 0
-            return self.write(self._ch_base_msb + sock * CH_SIZE + address, cntl_byte, data)
+        return self.write(self._sock_reg[sock] + address, self._sock_wcntl[sock], data)
 
     def _read_socket(self, sock, address):
         """Read a W5k socket register."""
-        if self._chip_type == "w5500":
-            cntl_byte = (sock << 5) + 0x08
-            return self.read(address, cntl_byte)
-        else :
-        #if self._chip_type == "w5100s":
-            cntl_byte = 0
-            return self.read(self._ch_base_msb + sock * CH_SIZE + address, cntl_byte)
+        return self.read(self._sock_reg[sock] + address, self._sock_rcntl[sock])
+
+    def _write_socket_word(self, sock, address, data):
+        """Write a 16-bit value to two contiguous W5k socket registers."""
+        return self._write_word(self._sock_reg[sock] + address, self._sock_wcntl[sock], data)
+
+    def _read_socket_into(self, sock, address, buffer, length):
+        """Read length contiguous W5k socket registers into buffer."""
+        self._read_into(self._sock_reg[sock] + address, self._sock_rcntl[sock], buffer, 0, length)
+
+    def _read_socket_word(self, sock, address):
+        """Read a 16-bit value from two contiguous W5k socket registers."""
+        self._read_socket_into(sock, address, self._pbuff, 2)
+        return self._pbuff[0] << 8 | self._pbuff[1]
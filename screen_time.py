@@ -0,0 +1,264 @@
+import struct
+from array import array
+import LD2410B
+
+#Screen time state machine
+#No I/O inside: feed it timestamped distances (live sensor or a recorded trace)
+#and act on the events it returns
+
+#Events returned by ScreenTimeSession.update
+Event_none = 0
+Event_enter = 1 # someone sat down in front of the screen
+Event_green = 2 # beginning period with the screen
+Event_yellow = 3 # it has been for a while with the screen
+Event_red = 4 # passed the screen time
+Event_leave = 5 # no one is in front of the screen anymore
+Event_names = (None, "Enter", "Green", "Yellow", "Red", "Leave")
+
+#File of ScreenTimeTotals: day number of the hour bins, hour bins, day bins, day number of every day bin
+Totals_record = "<l24l7l7l"
+Totals_size = struct.calcsize(Totals_record)
+
+"""
+Pick the distance of the targetting object from a sensor reading
+
+:param: LD2410B.Reading reading: latest reading
+
+:return: int: distance in cm, None if there is no target
+
+"""
+
+def distance (reading) -> int:
+    #check the sensor's targetting object
+    target = reading.target
+    if target == LD2410B.Target_both:
+        if reading.move_dist >= reading.stable_dist: #compare the distance - distance value is more accurate
+            data = reading.move_dist
+        else:
+            data = reading.stable_dist 
+    elif target == LD2410B.Target_moving: #If it detects the moving object, choose moving target
+        data = reading.move_dist
+    elif target == LD2410B.Target_stable: #Since the distance between the module is short, stable target could be consider to use.
+        data = reading.stable_dist
+        if data == 8: #if it shows 8 value, it means error.
+            data = reading.move_dist
+    else:
+        data = None # No target, just ignore
+    return data
+
+class ScreenTimeSession:
+
+    """
+    Presence / screen time session
+    One session starts with the first distance inside the seated range
+    and ends after a few distances outside of it
+
+
+    :param: int limit: screen time in seconds (Adafruit IO "scale" feed)
+            int near: seated range, lower bound in cm (excluded). Default: 65
+            int far: seated range, upper bound in cm (excluded). Default: 100
+            int leave_after: out of range distances in a row to end the session. Default: 5
+
+    """
+
+    __slots__ = ("limit", "near", "far", "leave_after", "start", "last", "absent", "state", "duration", "peak")
+
+    def __init__ (self, limit: int, near: int = 65, far: int = 100, leave_after: int = 5) -> None:
+        self.limit = limit
+        self.near = near
+        self.far = far
+        self.leave_after = leave_after
+        self.duration = 0 # length of the last finished session in seconds
+        self.peak = Event_none # highest colour event of the last finished session
+        self.reset()
+
+    """
+    End the session without an event (Adafruit IO reset)
+
+    """
+
+    def reset (self) -> None:
+        self.start = None # time of the first seated distance
+        self.last = None # time of the last seated distance
+        self.absent = 0 # out of range distances in a row
+        self.state = Event_none # last event of the session
+
+    """
+    Seconds since the session started
+
+    :param: float now: current time in seconds
+
+    :return: float: 0 if no session
+
+    """
+
+    def elapsed (self, now: float) -> float:
+        if self.start is None:
+            return 0
+        return now - self.start
+
+    """
+    Feed one distance
+
+    :param: float now: time of the distance in seconds
+            int data: distance in cm, None if the sensor has no target (ignored)
+
+    :return: int: event (Event_*), Event_none if nothing changed
+
+    """
+
+    def update (self, now: float, data: int) -> int:
+        if data is None:
+            return Event_none
+
+        if self.near < data < self.far:
+            self.absent = 0
+            self.last = now
+            if self.start is None:
+                self.start = now # Starting point
+                self.state = Event_enter
+                return Event_enter
+            difference = now - self.start
+            if difference <= self.limit / 3:
+                event = Event_green
+            elif difference < self.limit:
+                event = Event_yellow
+            else:
+                event = Event_red
+            if event == self.state:
+                return Event_none
+            self.state = event
+            return event
+
+        if self.start is None: # no one was there
+            return Event_none
+        self.absent += 1
+        if self.absent < self.leave_after:
+            return Event_none
+        self.duration = now - self.start
+        self.peak = self.state if self.state != Event_enter else Event_none
+        self.reset()
+        return Event_leave
+
+class ScreenTimeTotals:
+
+    """
+    Daily and weekly screen time totals, kept on the device
+    Session seconds go into 24 hour bins for the current day and 7 day bins,
+    both in arrays, so adding a session only touches the bins it spans
+    Optionally the bins are written to a file after every session so the totals survive a reset
+
+
+    :param: int utc_offset: seconds to add to the session times for the local day. Default: 0
+            str path: file to persist the totals in, None to keep them in RAM only. Default: None
+                      (CircuitPython can only write the flash if boot.py remounts it writable)
+
+    """
+
+    __slots__ = ("utc_offset", "path", "hours", "days", "_day", "_day_of")
+
+    def __init__ (self, utc_offset: int = 0, path: str = None) -> None:
+        self.utc_offset = utc_offset
+        self.path = path
+        self.hours = array("l", [0] * 24) # seconds per hour of the current day
+        self.days = array("l", [0] * 7) # seconds per day, slot = day number % 7
+        self._day_of = array("l", [-1] * 7) # day number held by each day slot
+        self._day = -1 # day number of the hour bins
+        if path is not None:
+            self._load()
+
+    """
+    Add a finished session, split over the hours and days it spans
+
+    :param: int start: start time in seconds (time.time())
+            int duration: length in seconds
+
+    """
+
+    def add (self, start: int, duration: int) -> None:
+        t = start + self.utc_offset
+        end = t + duration
+        while t < end:
+            day = t // 86400
+            step = min(end, (t // 3600 + 1) * 3600) - t # up to the end of the hour
+            self._roll(day)
+            slot = day % 7
+            if self._day_of[slot] != day:
+                self._day_of[slot] = day
+                self.days[slot] = 0
+            self.days[slot] += step
+            if day == self._day:
+                self.hours[t % 86400 // 3600] += step
+            t += step
+        self._save()
+
+    """
+    Seconds of screen time
+
+    :param: int now: current time in seconds (time.time())
+            int days: 1 for today, 7 for the last week. Default: 1
+
+    :return: int: seconds
+
+    """
+
+    def total (self, now: int, days: int = 1) -> int:
+        today = (now + self.utc_offset) // 86400
+        seconds = 0
+        for slot in range(7):
+            if today - days < self._day_of[slot] <= today:
+                seconds += self.days[slot]
+        return seconds
+
+    """
+    Compact summary to publish: "today,week;minutes of hour 0,...,minutes of hour 23"
+
+    :param: int now: current time in seconds (time.time())
+
+    :return: str: minutes, rounded down
+
+    """
+
+    def summary (self, now: int) -> str:
+        self._roll((now + self.utc_offset) // 86400)
+        return "{},{};{}".format(self.total(now) // 60, self.total(now, 7) // 60,
+                                 ",".join(str(seconds // 60) for seconds in self.hours))
+
+    def _roll (self, day: int) -> None:
+        # a new day starts with empty hour bins, older days do not touch them
+        if day > self._day:
+            self._day = day
+            for hour in range(24):
+                self.hours[hour] = 0
+
+    """
+    Read the bins back from the file
+    A file cut by a reset during a write is ignored, the totals start again from zero
+
+    """
+
+    def _load (self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                record = f.read(Totals_size)
+        except OSError: # no file yet
+            return
+        if len(record) < Totals_size:
+            return
+        values = struct.unpack(Totals_record, record)
+        self._day = values[0]
+        for hour in range(24):
+            self.hours[hour] = values[1 + hour]
+        for slot in range(7):
+            self.days[slot] = values[25 + slot]
+            self._day_of[slot] = values[32 + slot]
+
+    def _save (self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "wb") as f:
+                f.write(struct.pack(Totals_record, self._day, *self.hours, *self.days, *self._day_of))
+        except OSError as e:
+            print("Totals not persisted\n", e)
+            self.path = None
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import LD2410B
+import screen_time
+
+#Desktop check of the screen time state machine (python screen_time_test.py, or pytest)
+#Timestamped distances go in, the events coming out must follow a seated session:
+#enter, green, yellow after a third of the limit, red at the limit, leave after leave_after absent readings
+#The daily / weekly totals read back from their file after a reset
+
+Limit = 60
+
+"""
+Feed distances one second apart
+
+:param: ScreenTimeSession session: session to drive
+        float start: time of the first distance in seconds
+        list distances: distances in cm (None = no target)
+
+:return: list: (time, event) of every event that is not Event_none
+
+"""
+
+def feed (session, start: float, distances) -> list:
+    events = []
+    for i, data in enumerate(distances):
+        event = session.update(start + i, data)
+        if event != screen_time.Event_none:
+            events.append((start + i, event))
+    return events
+
+"""
+A full session: every colour once, in order, then leave with the duration and the peak colour
+
+"""
+
+def test_session_transitions () -> None:
+    session = screen_time.ScreenTimeSession(Limit)
+    events = feed(session, 1000, [80] * 70 + [150] * 5)
+    assert events == [(1000, screen_time.Event_enter), (1001, screen_time.Event_green),
+                      (1021, screen_time.Event_yellow), (1060, screen_time.Event_red),
+                      (1074, screen_time.Event_leave)], events
+    assert session.duration == 74
+    assert session.peak == screen_time.Event_red
+    assert session.start is None and session.state == screen_time.Event_none
+
+"""
+Readings that must not end or start a session
+
+"""
+
+def test_session_absence () -> None:
+    session = screen_time.ScreenTimeSession(Limit, leave_after = 5)
+    # out of the seated range and no target: nobody there
+    assert feed(session, 0, [30, 150, None, 65, 100]) == []
+    # a short absence and missing targets do not end the session, only leave_after absent readings in a row do
+    events = feed(session, 10, [80, 80] + [150] * 4 + [None] * 3 + [80] + [150] * 4 + [120])
+    assert [event for stamp, event in events] == [screen_time.Event_enter, screen_time.Event_green,
+                                                  screen_time.Event_leave], events
+    assert events[-1][0] == 24
+    assert session.peak == screen_time.Event_green
+
+"""
+A session that never went past enter has no peak colour, reset() drops a session without an event
+
+"""
+
+def test_session_reset () -> None:
+    session = screen_time.ScreenTimeSession(Limit, leave_after = 2)
+    events = feed(session, 0, [80, 150, 150])
+    assert [event for stamp, event in events] == [screen_time.Event_enter, screen_time.Event_leave]
+    assert session.duration == 2 and session.peak == screen_time.Event_none
+    feed(session, 10, [80, 80])
+    assert session.elapsed(20) == 10
+    session.reset()
+    assert session.elapsed(20) == 0
+    assert feed(session, 30, [150] * 3) == []
+    assert feed(session, 40, [80])[0][1] == screen_time.Event_enter
+
+"""
+The distance of a reading follows the target state
+
+"""
+
+def test_distance () -> None:
+    Reading = LD2410B.Reading
+    assert screen_time.distance(Reading(LD2410B.Target_both, move_dist = 90, stable_dist = 70)) == 90
+    assert screen_time.distance(Reading(LD2410B.Target_both, move_dist = 60, stable_dist = 70)) == 70
+    assert screen_time.distance(Reading(LD2410B.Target_moving, move_dist = 90, stable_dist = 70)) == 90
+    assert screen_time.distance(Reading(LD2410B.Target_stable, move_dist = 90, stable_dist = 70)) == 70
+    assert screen_time.distance(Reading(LD2410B.Target_stable, move_dist = 90, stable_dist = 8)) == 90
+    assert screen_time.distance(Reading(LD2410B.Target_none, move_dist = 90, stable_dist = 70)) is None
+
+"""
+The totals survive a reset through their file, a file cut short is ignored
+
+"""
+
+def test_totals_file () -> None:
+    day = 19000 * 86400 # midnight UTC
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "totals.bin")
+        totals = screen_time.ScreenTimeTotals(path = path)
+        totals.add(day - 86400 + 3600, 600) # yesterday
+        totals.add(day + 3 * 3600 - 300, 900) # today, across 3:00
+        summary = totals.summary(day + 12 * 3600)
+        assert summary.startswith("15,25;0,0,5,10,0"), summary
+        totals = screen_time.ScreenTimeTotals(path = path)
+        assert totals.summary(day + 12 * 3600) == summary
+        with open(path, "r+b") as f:
+            f.truncate(screen_time.Totals_size - 4)
+        totals = screen_time.ScreenTimeTotals(path = path)
+        assert totals.total(day + 12 * 3600, 7) == 0
+
+if __name__ == "__main__":
+    test_session_transitions()
+    test_session_absence()
+    test_session_reset()
+    test_distance()
+    test_totals_file()
+    print("OK")
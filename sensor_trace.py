@@ -0,0 +1,190 @@
+import time
+import struct
+
+#Sensor traces: record the raw LD2410B UART stream, replay it without the radar
+#Record in the file: milliseconds since the start of the recording, flags + length, data
+Record = "<IH"
+Record_size = struct.calcsize(Record)
+Flag_write = 0x8000 # bytes written to the module (commands), not fed back by the replay
+Length_mask = 0x7FFF
+
+class Recorder:
+
+    """
+    UART wrapper that logs every chunk read from / written to the module with its time
+    Use it in place of the UART: LD2410B(board.GP0, board.GP1, uart = sensor_trace.Recorder(busio.UART(...), "/trace.bin"))
+    The records are kept in RAM and appended to the file in blocks
+
+
+    :param: uart: UART of the module
+            str path: trace file (CircuitPython: only if boot.py remounts the flash writable)
+            int block: bytes kept in RAM before they are written. Default: 1024
+            callable clock: time source in seconds. Default: time.monotonic
+
+    """
+
+    def __init__ (self, uart, path: str, block: int = 1024, clock = time.monotonic) -> None:
+        self.uart = uart
+        self.path = path
+        self.block = block
+        self.clock = clock
+        self.start = clock()
+        self.records = 0
+        self._pending = bytearray()
+        with open(path, "wb"):
+            pass
+
+    @property
+    def in_waiting (self) -> int:
+        return self.uart.in_waiting
+
+    def readinto (self, buf, nbytes: int = None) -> int:
+        count = self.uart.readinto(buf) if nbytes is None else self.uart.readinto(buf, nbytes)
+        if count:
+            self._log(0, buf[:count])
+        return count
+
+    def read (self, nbytes: int = None) -> bytes:
+        data = self.uart.read(nbytes)
+        if data:
+            self._log(0, data)
+        return data
+
+    def write (self, data) -> int:
+        self._log(Flag_write, data)
+        return self.uart.write(data)
+
+    def reset_input_buffer (self) -> None:
+        self.uart.reset_input_buffer()
+
+    """
+    Write the records kept in RAM to the file
+
+    """
+
+    def flush (self) -> None:
+        if self._pending:
+            with open(self.path, "ab") as f:
+                f.write(self._pending)
+            self._pending = bytearray()
+
+    def _log (self, flags: int, data) -> None:
+        stamp = int((self.clock() - self.start) * 1000)
+        self._pending += struct.pack(Record, stamp, flags | len(data))
+        self._pending += data
+        self.records += 1
+        if len(self._pending) >= self.block:
+            self.flush()
+
+"""
+Read a trace file
+
+:param: str path: trace file
+
+:return: list: (milliseconds, flags, data) of every record
+
+"""
+
+def load (path: str) -> list:
+    records = []
+    with open(path, "rb") as f:
+        raw = f.read()
+    pos = 0
+    while pos + Record_size <= len(raw):
+        stamp, length = struct.unpack_from(Record, raw, pos)
+        pos += Record_size
+        data = raw[pos:pos + (length & Length_mask)]
+        if len(data) < length & Length_mask:
+            break # cut by a reset
+        records.append((stamp, length & Flag_write, data))
+        pos += len(data)
+    return records
+
+class ReplayClock:
+
+    """
+    Clock driven by the replay instead of the wall clock
+    Pass its methods wherever the code asks for time.monotonic / time.time / time.sleep
+
+
+    :param: float epoch: value of time() at the start of the trace. Default: 1700000000
+
+    """
+
+    def __init__ (self, epoch: float = 1700000000) -> None:
+        self.now = 0.0
+        self.epoch = epoch
+
+    def monotonic (self) -> float:
+        return self.now
+
+    def time (self) -> float:
+        return self.epoch + self.now
+
+    def sleep (self, seconds: float) -> None:
+        self.now += seconds
+
+class ReplayUART:
+
+    """
+    UART stand-in that serves the bytes of a trace once the clock reaches their time
+    Bytes written (commands) are counted and dropped
+
+
+    :param: list records: from load()
+            ReplayClock clock: replay time
+
+    """
+
+    def __init__ (self, records: list, clock: ReplayClock) -> None:
+        self.clock = clock
+        self._records = [(stamp / 1000, data) for stamp, flags, data in records if not flags]
+        self._next = 0 # next record to deliver
+        self._rx = bytearray()
+        self.written = 0
+
+    @property
+    def done (self) -> bool:
+        return self._next == len(self._records) and not self._rx
+
+    """
+    Time of the next record that is not delivered yet
+
+    :return: float: seconds, None at the end of the trace
+
+    """
+
+    def next_time (self):
+        if self._next < len(self._records):
+            return self._records[self._next][0]
+        return None
+
+    @property
+    def in_waiting (self) -> int:
+        records = self._records
+        now = self.clock.now
+        while self._next < len(records) and records[self._next][0] <= now:
+            self._rx += records[self._next][1]
+            self._next += 1
+        return len(self._rx)
+
+    def readinto (self, buf, nbytes: int = None) -> int:
+        count = min(len(buf) if nbytes is None else nbytes, self.in_waiting)
+        buf[:count] = self._rx[:count]
+        del self._rx[:count]
+        return count
+
+    def read (self, nbytes: int = None) -> bytes:
+        if nbytes is None:
+            nbytes = self.in_waiting
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data
+
+    def write (self, data) -> int:
+        self.written += len(data)
+        return len(data)
+
+    def reset_input_buffer (self) -> None:
+        self.in_waiting
+        self._rx = bytearray()
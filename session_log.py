@@ -0,0 +1,168 @@
+import time
+import struct
+from array import array
+
+#Store-and-forward log of finished screen time sessions
+#Sessions are kept while the broker is unreachable and sent in bulk after the reconnect
+#Optionally every change is appended to a file so the log survives a reset
+
+#Record in the file: kind, start, duration, level
+Record = "<BiiB"
+Record_size = struct.calcsize(Record)
+Kind_session = 0x53 # "S": one session added
+Kind_drained = 0x44 # "D": the start field is the number of oldest sessions sent
+
+class SessionLog:
+
+    """
+    Bounded ring of sessions (start, duration, peak level) packed in an array
+    When it is full the oldest session is dropped
+
+
+    :param: int size: maximum number of sessions. Default: 64
+            str path: file to persist the log in, None to keep it in RAM only. Default: None
+                      (CircuitPython can only write the flash if boot.py remounts it writable)
+            float interval: seconds between two drains. Default: 10
+            callable clock: time source in seconds. Default: time.monotonic
+
+    """
+
+    def __init__ (self, size: int = 64, path: str = None, interval: float = 10, clock = time.monotonic) -> None:
+        self.size = size
+        self.path = path
+        self.interval = interval
+        self.clock = clock
+        self._data = array("l", [0] * (size * 3)) # start, duration, level of every slot
+        self._head = 0
+        self._count = 0
+        self._next = 0 # earliest time of the next drain
+        self._records = 0 # records in the file
+        self.dropped = 0
+        self.sent = 0
+        if path is not None:
+            self._load()
+
+    def __len__ (self) -> int:
+        return self._count
+
+    """
+    Read a session
+
+    :param: int i: 0 for the oldest session
+
+    :return: tuple: (start, duration, level)
+
+    """
+
+    def get (self, i: int) -> tuple:
+        slot = (self._head + i) % self.size * 3
+        return self._data[slot], self._data[slot + 1], self._data[slot + 2]
+
+    """
+    Add a finished session
+
+    :param: int start: start time in seconds (time.time())
+            int duration: length in seconds
+            int level: peak colour level (screen_time.Event_green / _yellow / _red, 0 if none)
+
+    """
+
+    def put (self, start: int, duration: int, level: int) -> None:
+        self._add(start, duration, level)
+        self._append(Kind_session, start, duration, level)
+
+    """
+    Send the oldest sessions as one publish, at most once per interval
+    The value is "start,duration,level" per session, separated by ";"
+    The sessions are only removed once publish returns
+
+    :param: callable publish: called with the value
+            int batch: maximum number of sessions in one publish. Default: 8
+
+    :return: int: number of sessions sent
+
+    """
+
+    def drain (self, publish, batch: int = 8) -> int:
+        now = self.clock()
+        if not self._count or now < self._next:
+            return 0
+        self._next = now + self.interval
+        count = min(batch, self._count)
+        value = ";".join("{},{},{}".format(*self.get(i)) for i in range(count))
+        publish(value)
+        self._remove(count)
+        self.sent += count
+        self._append(Kind_drained, count, 0, 0)
+        return count
+
+    def _add (self, start: int, duration: int, level: int) -> None:
+        if self._count == self.size:
+            self._remove(1)
+            self.dropped += 1
+        slot = (self._head + self._count) % self.size * 3
+        self._data[slot] = start
+        self._data[slot + 1] = duration
+        self._data[slot + 2] = level
+        self._count += 1
+
+    def _remove (self, count: int) -> None:
+        count = min(count, self._count)
+        self._head = (self._head + count) % self.size
+        self._count -= count
+
+    """
+    Rebuild the ring from the file: add the sessions, remove the drained ones
+    A record cut by a reset is dropped and the file rewritten, the next records would not line up otherwise
+
+    """
+
+    def _load (self) -> None:
+        torn = False
+        try:
+            with open(self.path, "rb") as f:
+                while True:
+                    record = f.read(Record_size)
+                    if len(record) < Record_size:
+                        torn = len(record) > 0
+                        break
+                    kind, start, duration, level = struct.unpack(Record, record)
+                    if kind == Kind_session:
+                        self._add(start, duration, level)
+                    elif kind == Kind_drained:
+                        self._remove(start)
+                    self._records += 1
+        except OSError: # no file yet
+            pass
+        self.dropped = 0
+        if torn:
+            self._compact()
+
+    def _append (self, kind: int, start: int, duration: int, level: int) -> None:
+        if self.path is None:
+            return
+        if self._records >= self.size * 4:
+            self._compact() # the ring already holds this change
+            return
+        try:
+            with open(self.path, "ab") as f:
+                f.write(struct.pack(Record, kind, start, duration, level))
+            self._records += 1
+        except OSError as e:
+            print("Session log not persisted\n", e)
+            self.path = None
+
+    """
+    Rewrite the file with only the sessions still waiting
+
+    """
+
+    def _compact (self) -> None:
+        try:
+            with open(self.path, "wb") as f:
+                for i in range(self._count):
+                    f.write(struct.pack(Record, Kind_session, *self.get(i)))
+            self._records = self._count
+        except OSError as e:
+            print("Session log not persisted\n", e)
+            self.path = None
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import session_log
+
+#Desktop check of the store-and-forward session log (python session_log_test.py, or pytest)
+#A stand-in broker goes down for 10 minutes while sessions keep finishing,
+#then the board resets, reloads the log from the file and drains it after the reconnect
+
+class Broker:
+
+    """
+    Stand-in for Adafruit IO: publish raises while the broker is down
+
+    """
+
+    def __init__ (self) -> None:
+        self.up = True
+        self.received = [] # (time, value)
+
+    def publish (self, value) -> None:
+        if not self.up:
+            raise RuntimeError("broker unreachable")
+        self.received.append((clock[0], value))
+
+clock = [0.0]
+
+"""
+Every 20 s a session ends, the broker is down from 60 s to 660 s
+The board resets at 700 s, the broker comes back at 720 s
+
+"""
+
+def test_outage_and_reset () -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "sessions.bin")
+        broker = Broker()
+        log = session_log.SessionLog(16, path, 10, lambda: clock[0])
+        for step in range(0, 900 * 10):
+            clock[0] = step / 10
+            now = clock[0]
+            if step % 200 == 0 and now < 700:
+                log.put(1700000000 + int(now), 15, 2 + step // 200 % 3)
+            broker.up = not 60 <= now < 720
+            if now == 700:
+                log = session_log.SessionLog(16, path, 10, lambda: clock[0])
+                print("After the reset: {} sessions reloaded".format(len(log)))
+            try:
+                log.drain(broker.publish, 4)
+            except RuntimeError:
+                pass # kept for the next try
+
+        sessions = [value for t, values in broker.received for value in values.split(";")]
+        starts = [int(value.split(",")[0]) - 1700000000 for value in sessions]
+        print("Publishes: {}, sessions received: {}".format(len(broker.received), len(sessions)))
+        print("Drain times after the outage: {}".format([t for t, values in broker.received if t >= 720]))
+        assert starts == sorted(starts), "sessions out of order"
+        assert len(set(starts)) == len(starts), "session sent twice"
+        #16 slots: the sessions that ended during the outage beyond the last 16 are dropped
+        assert starts[-1] == 680 and len([s for s in starts if s >= 60]) == 16
+        gaps = [b[0] - a[0] for a, b in zip(broker.received, broker.received[1:])]
+        assert min(gaps) >= 10, "drained faster than the interval"
+        assert len(log) == 0
+
+"""
+A reset in the middle of an append leaves a torn record: it is dropped on load
+and the sessions added afterwards are read back correctly after the next reset
+
+"""
+
+def test_torn_record () -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "sessions.bin")
+        log = session_log.SessionLog(16, path, 10, lambda: clock[0])
+        log.put(1700001000, 30, 2)
+        with open(path, "ab") as f:
+            f.write(b"S\x01\x02") # first bytes of a record
+        log = session_log.SessionLog(16, path, 10, lambda: clock[0])
+        log.put(1700002000, 45, 3)
+        log = session_log.SessionLog(16, path, 10, lambda: clock[0])
+        assert [log.get(i) for i in range(len(log))] == [(1700001000, 30, 2), (1700002000, 45, 3)], "torn record kept"
+
+if __name__ == "__main__":
+    test_outage_and_reset()
+    test_torn_record()
+    print("OK")
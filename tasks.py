@@ -0,0 +1,300 @@
+import time
+
+#Cooperative tasks for the main loop
+#Every stage runs at its own rate, stages talk through bounded queues
+
+class Queue:
+
+    """
+    Bounded FIFO queue between two tasks
+    When it is full the oldest item is dropped, so a slow consumer never blocks the producer
+
+
+    :param: int size: maximum number of items
+
+    """
+
+    __slots__ = ("_items", "_head", "_count", "dropped")
+
+    def __init__ (self, size: int) -> None:
+        self._items = [None] * size
+        self._head = 0
+        self._count = 0
+        self.dropped = 0
+
+    def __len__ (self) -> int:
+        return self._count
+
+    """
+    Add an item (drop the oldest one if the queue is full)
+
+    :param: item: anything
+
+    """
+
+    def put (self, item) -> None:
+        size = len(self._items)
+        if self._count == size:
+            self._head = (self._head + 1) % size
+            self._count -= 1
+            self.dropped += 1
+        self._items[(self._head + self._count) % size] = item
+        self._count += 1
+
+    """
+    Take the oldest item
+
+    :return: the item, None if the queue is empty
+
+    """
+
+    def get (self):
+        if self._count == 0:
+            return None
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._head = (self._head + 1) % len(self._items)
+        self._count -= 1
+        return item
+
+    """
+    Remove every item
+
+    """
+
+    def clear (self) -> None:
+        while self._count:
+            self.get()
+
+class PublishQueue:
+
+    """
+    Outbound publishes, one pending value per feed
+    A new value replaces the pending one, a value equal to the last one sent is dropped,
+    and every feed is rate limited: at most one publish per interval seconds,
+    and rate publishes per second over all feeds (Adafruit IO throttle: 30 per minute)
+
+
+    :param: float interval: seconds between two publishes of one feed. Default: 2
+            float rate: publishes per second over all feeds. Default: 0.5
+            int burst: publishes that can be sent at once after a quiet time. Default: 4
+            callable clock: time source in seconds. Default: time.monotonic
+
+    """
+
+    def __init__ (self, interval: float = 2, rate: float = 0.5, burst: int = 4, clock = time.monotonic) -> None:
+        self.interval = interval
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.intervals = {} # per feed interval, see limit()
+        self.repeat = [] # feeds whose repeated values are still sent, see limit()
+        self._feeds = [] # pending feeds, oldest first
+        self._values = []
+        self._sent = {} # feed: last value sent
+        self._sent_at = {} # feed: time of the last publish
+        self._tokens = burst
+        self._stamp = clock()
+        self.sent = 0
+        self.coalesced = 0 # pending values replaced by a newer one
+        self.suppressed = 0 # values dropped because the feed already shows them
+
+    def __len__ (self) -> int:
+        return len(self._feeds)
+
+    """
+    Set the interval of one feed
+
+    :param: str feed: feed name
+            float interval: seconds between two publishes of the feed
+            bool dedupe: drop values equal to the last one sent. Default: True
+                         (False for event feeds, where every value counts)
+
+    """
+
+    def limit (self, feed: str, interval: float, dedupe: bool = True) -> None:
+        self.intervals[feed] = interval
+        if dedupe:
+            if feed in self.repeat:
+                self.repeat.remove(feed)
+        elif feed not in self.repeat:
+            self.repeat.append(feed)
+
+    """
+    Queue a value (replace the pending value of the feed)
+
+    :param: str feed: feed name
+            value: value to publish
+
+    """
+
+    def put (self, feed: str, value) -> None:
+        sent = self._sent.get(feed)
+        if feed in self.repeat:
+            sent = None
+        if feed in self._feeds:
+            i = self._feeds.index(feed)
+            self.coalesced += 1
+            if value == sent: # back to what the feed shows, nothing to send
+                self._feeds.pop(i)
+                self._values.pop(i)
+            else:
+                self._values[i] = value
+        elif sent is not None and value == sent:
+            self.suppressed += 1
+        else:
+            self._feeds.append(feed)
+            self._values.append(value)
+
+    """
+    Drop every pending value
+
+    """
+
+    def clear (self) -> None:
+        self._feeds = []
+        self._values = []
+
+    """
+    Publish the pending values that the rate limits allow, oldest first
+    A value whose publish raises stays pending
+
+    :param: callable publish: called with (feed, value)
+            int batch: maximum number of publishes. Default: 4
+
+    :return: int: number of publishes sent
+
+    """
+
+    def flush (self, publish, batch: int = 4) -> int:
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        count = 0
+        i = 0
+        while i < len(self._feeds) and count < batch and self._tokens >= 1:
+            feed = self._feeds[i]
+            last = self._sent_at.get(feed)
+            if last is not None and now - last < self.intervals.get(feed, self.interval):
+                i += 1 # this feed is throttled, try the next one
+                continue
+            value = self._values[i]
+            publish(feed, value)
+            self._feeds.pop(i)
+            self._values.pop(i)
+            self._sent[feed] = value
+            self._sent_at[feed] = now
+            self._tokens -= 1
+            self.sent += 1
+            count += 1
+        return count
+
+class Task:
+
+    """
+    One task of the Scheduler
+
+
+    :param: str name: name shown in the report
+            callable func: called without arguments every period
+            float period: seconds between two runs
+
+    """
+
+    __slots__ = ("name", "func", "period", "next_run", "runs", "max_time", "max_late")
+
+    def __init__ (self, name: str, func, period: float) -> None:
+        self.name = name
+        self.func = func
+        self.period = period
+        self.next_run = 0
+        self.runs = 0
+        self.max_time = 0 # worst run time in seconds
+        self.max_late = 0 # worst delay after the planned start in seconds
+
+class Scheduler:
+
+    """
+    Run the tasks cooperatively, each one at its own rate
+    The worst run time and the worst start delay of every task are recorded
+
+
+    :param: callable clock: time source in seconds. Default: time.monotonic
+            callable sleep: sleep function in seconds. Default: time.sleep
+
+    """
+
+    def __init__ (self, clock = time.monotonic, sleep = time.sleep) -> None:
+        self.clock = clock
+        self.sleep = sleep
+        self.tasks = []
+
+    """
+    Add a task
+
+    :param: str name: name shown in the report
+            callable func: called without arguments every period
+            float period: seconds between two runs
+
+    :return: Task: the new task
+
+    """
+
+    def add (self, name: str, func, period: float) -> Task:
+        task = Task(name, func, period)
+        task.next_run = self.clock()
+        self.tasks.append(task)
+        return task
+
+    """
+    Run every task that is due once
+
+    :return: float: seconds until the next task is due
+
+    """
+
+    def run_once (self) -> float:
+        for task in self.tasks:
+            start = self.clock()
+            if start < task.next_run:
+                continue
+            late = start - task.next_run
+            if late > task.max_late:
+                task.max_late = late
+            task.func()
+            end = self.clock()
+            if end - start > task.max_time:
+                task.max_time = end - start
+            task.runs += 1
+            task.next_run += task.period
+            if task.next_run < end:
+                # Too far behind - skip the missed runs instead of bursting
+                task.next_run = end + task.period
+
+        wait = None
+        now = self.clock()
+        for task in self.tasks:
+            if wait is None or task.next_run - now < wait:
+                wait = task.next_run - now
+        return wait if wait is not None and wait > 0 else 0
+
+    """
+    Run the tasks forever, sleeping while no task is due
+
+    """
+
+    def run (self) -> None:
+        while True:
+            wait = self.run_once()
+            if wait:
+                self.sleep(wait)
+
+    """
+    Print the worst run time and start delay of every task
+
+    """
+
+    def report (self) -> None:
+        for task in self.tasks:
+            print("{}: runs {} / worst time {:.1f} ms / worst delay {:.1f} ms".format(
+                task.name, task.runs, task.max_time * 1000, task.max_late * 1000))
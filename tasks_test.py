@@ -0,0 +1,145 @@
+import tasks
+
+#Desktop check of the outbound publish queue (python tasks_test.py, or pytest)
+#A newer value replaces the pending one, a value the feed already shows is dropped,
+#and the per feed interval and the token bucket over all feeds hold on a clock the check moves
+
+class Clock:
+
+    """
+    Time source the check moves by hand
+
+    """
+
+    def __init__ (self) -> None:
+        self.now = 0.0
+
+    def __call__ (self) -> float:
+        return self.now
+
+"""
+Flush a queue and collect what is published
+
+:param: PublishQueue queue: queue to flush
+        int batch: maximum number of publishes. Default: 4
+
+:return: list: (feed, value) in publish order
+
+"""
+
+def flush (queue, batch: int = 4) -> list:
+    sent = []
+    queue.flush(lambda feed, value: sent.append((feed, value)), batch)
+    return sent
+
+"""
+Only the latest pending value of a feed is published, values the feed already shows are not
+
+"""
+
+def test_coalesce_dedupe () -> None:
+    clock = Clock()
+    queue = tasks.PublishQueue(clock = clock)
+    queue.put("light", "#26fc05")
+    queue.put("light", "#faf207")
+    queue.put("alert", "Red")
+    assert len(queue) == 2 and queue.coalesced == 1
+    assert flush(queue) == [("light", "#faf207"), ("alert", "Red")]
+    clock.now += 10
+    queue.put("light", "#faf207") # already shown
+    assert len(queue) == 0 and queue.suppressed == 1
+    # flapping back to the shown value cancels the pending one
+    queue.put("light", "#fc0905")
+    queue.put("light", "#faf207")
+    assert len(queue) == 0 and flush(queue) == []
+
+"""
+Feeds set with dedupe = False publish every value, still one pending value at a time
+
+"""
+
+def test_repeat_feed () -> None:
+    clock = Clock()
+    queue = tasks.PublishQueue(clock = clock)
+    queue.limit("alert", 2, dedupe = False)
+    queue.put("alert", "Red")
+    assert flush(queue) == [("alert", "Red")]
+    clock.now += 2
+    queue.put("alert", "Red")
+    assert flush(queue) == [("alert", "Red")]
+    queue.limit("alert", 2)
+    clock.now += 2
+    queue.put("alert", "Red")
+    assert flush(queue) == [] and queue.suppressed == 1
+
+"""
+One publish per interval and feed, the other feeds go meanwhile
+
+"""
+
+def test_feed_interval () -> None:
+    clock = Clock()
+    queue = tasks.PublishQueue(interval = 2, clock = clock)
+    queue.limit("summary", 60)
+    queue.put("summary", "1,2")
+    queue.put("light", "#26fc05")
+    assert flush(queue) == [("summary", "1,2"), ("light", "#26fc05")]
+    clock.now += 3
+    queue.put("summary", "2,3")
+    queue.put("light", "#faf207")
+    assert flush(queue) == [("light", "#faf207")] # summary waits for its 60 s
+    clock.now += 57
+    assert flush(queue) == [("summary", "2,3")]
+
+"""
+The token bucket: burst publishes at once, then rate per second over all feeds
+
+"""
+
+def test_rate_limit () -> None:
+    clock = Clock()
+    queue = tasks.PublishQueue(interval = 0, rate = 0.5, burst = 4, clock = clock)
+    for i in range(6):
+        queue.put("feed{}".format(i), i)
+    assert len(flush(queue, 10)) == 4
+    assert flush(queue, 10) == []
+    clock.now += 2 # one token
+    assert flush(queue, 10) == [("feed4", 4)]
+    clock.now += 100 # never more than burst tokens
+    for i in range(6):
+        queue.put("more{}".format(i), i)
+    assert len(flush(queue, 10)) == 4
+    assert len(flush(queue, 1)) == 0
+    assert queue.sent == 9
+
+"""
+A publish that raises keeps its value pending, clear() drops every pending value
+
+"""
+
+def test_publish_error () -> None:
+    clock = Clock()
+    queue = tasks.PublishQueue(clock = clock)
+    queue.put("light", "#26fc05")
+
+    def fail (feed, value):
+        raise OSError("broker lost")
+
+    try:
+        queue.flush(fail)
+        assert False, "publish error lost"
+    except OSError:
+        pass
+    assert len(queue) == 1
+    assert flush(queue) == [("light", "#26fc05")]
+    queue.put("light", "#000000")
+    queue.clear()
+    assert len(queue) == 0
+
+if __name__ == "__main__":
+    test_coalesce_dedupe()
+    test_repeat_feed()
+    test_feed_interval()
+    test_rate_limit()
+    test_publish_error()
+    print("OK")
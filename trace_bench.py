@@ -0,0 +1,157 @@
+import sys
+import time
+import struct
+import random
+import argparse
+import sensor_trace
+import LD2410B
+import screen_time
+
+#Desktop benchmark: replay a sensor trace through the LD2410B driver and the screen time logic
+#python trace_bench.py trace.bin [--limit 600]    replay a trace recorded with sensor_trace.Recorder
+#python trace_bench.py --synth 30 synth.bin       write a 30 minute synthetic trace first, then replay it
+#The replay clock jumps to the next UART chunk, so a trace runs at full speed
+
+"""
+Build a basic mode report frame
+
+:param: int target: target state code
+        int dist: distance of the target in cm
+
+:return: bytes: frame
+
+"""
+
+def report_frame (target: int, dist: int) -> bytes:
+    data = bytes((LD2410B.Mode_basic, LD2410B.Out_data_head[0], target,
+                  dist & 0xFF, dist >> 8, 60, dist & 0xFF, dist >> 8, 40, 0, 0,
+                  LD2410B.Out_data_end[0], 0))
+    return LD2410B.Out_head + struct.pack("<H", len(data)) + data + LD2410B.Out_end
+
+"""
+Write a synthetic trace: someone sits down and leaves again, 10 frames per second
+The frames are cut in random UART chunks like the real stream
+
+:param: str path: trace file
+        float minutes: length of the trace
+        int seed: random seed. Default: 1
+
+"""
+
+def synthesize (path: str, minutes: float, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    end = minutes * 60
+    t = 0.0
+    with open(path, "wb") as f:
+        while t < end:
+            seated = rnd.uniform(60, 900) # seconds in front of the screen
+            away = rnd.uniform(30, 300)
+            for phase, length in ((True, seated), (False, away)):
+                stop = min(t + length, end)
+                while t < stop:
+                    if phase:
+                        frame = report_frame(LD2410B.Target_both, rnd.randint(70, 95))
+                    elif rnd.random() < 0.3:
+                        frame = report_frame(LD2410B.Target_moving, rnd.randint(150, 400))
+                    else:
+                        frame = report_frame(LD2410B.Target_none, 0)
+                    #at 256000 baud a frame arrives in about 1 ms, in one to three chunks
+                    pos = 0
+                    stamp = t
+                    while pos < len(frame):
+                        size = min(rnd.randint(6, 23), len(frame) - pos)
+                        f.write(struct.pack(sensor_trace.Record, int(stamp * 1000), size))
+                        f.write(frame[pos:pos + size])
+                        pos += size
+                        stamp += 0.0005
+                    t += 0.1
+
+"""
+Replay a trace through LD2410B.poll, screen_time.distance, ScreenTimeSession and ScreenTimeTotals
+
+:param: list records: from sensor_trace.load()
+        int limit: screen time in seconds
+        float step: polling period of the sensor task in seconds
+
+:return: dict: statistics
+
+"""
+
+def replay (records: list, limit: int, step: float) -> dict:
+    clock = sensor_trace.ReplayClock()
+    uart = sensor_trace.ReplayUART(records, clock)
+    sensor = LD2410B.LD2410B(None, None, uart = uart)
+    session = screen_time.ScreenTimeSession(limit)
+    totals = screen_time.ScreenTimeTotals()
+    stages = {"poll": [], "distance": [], "session": []}
+    events = [0] * len(screen_time.Event_names)
+    sessions = []
+    frames = 0
+    polls = 0
+    perf = time.perf_counter
+    start = perf()
+    while not uart.done:
+        next_time = uart.next_time()
+        if next_time is not None:
+            clock.now = max(clock.now + step, next_time)
+        t0 = perf()
+        sensor.poll()
+        t1 = perf()
+        polls += 1
+        stages["poll"].append(t1 - t0)
+        if sensor.frames == frames:
+            continue
+        frames = sensor.frames
+        data = screen_time.distance(sensor.reading)
+        t2 = perf()
+        now = clock.time()
+        event = session.update(now, data)
+        t3 = perf()
+        stages["distance"].append(t2 - t1)
+        stages["session"].append(t3 - t2)
+        events[event] += 1
+        if event == screen_time.Event_leave:
+            begin = int(now - session.duration)
+            totals.add(begin, int(session.duration))
+            sessions.append((begin - clock.epoch, session.duration, session.peak))
+    wall = perf() - start
+    return {"wall": wall, "trace": clock.now, "frames": frames, "polls": polls, "stages": stages,
+            "events": events, "sessions": sessions, "summary": totals.summary(int(clock.time()))}
+
+"""
+Print the statistics of a replay
+
+:param: dict stats: from replay()
+
+"""
+
+def report (stats: dict) -> None:
+    print("{} frames in {:.1f} s of trace, replayed in {:.3f} s: {:.0f} frames/s ({} polls)".format(
+        stats["frames"], stats["trace"], stats["wall"], stats["frames"] / stats["wall"], stats["polls"]))
+    for name, times in stats["stages"].items():
+        if not times:
+            continue
+        times = sorted(times)
+        print("{:9} mean {:6.1f} us / p99 {:6.1f} us / max {:7.1f} us".format(name,
+              sum(times) / len(times) * 1e6, times[len(times) * 99 // 100] * 1e6, times[-1] * 1e6))
+    print("Events: " + ", ".join("{} {}".format(name, count) for name, count
+                                 in zip(screen_time.Event_names, stats["events"]) if name))
+    for begin, duration, peak in stats["sessions"]:
+        print("Session at {:7.1f} s: {:6.1f} s, peak {}".format(begin, duration,
+              screen_time.Event_names[peak] or "none"))
+    print("Summary (today,week;minutes per hour): " + stats["summary"])
+
+def main (argv = None) -> None:
+    parser = argparse.ArgumentParser(description = "Replay an LD2410B trace through the screen time pipeline")
+    parser.add_argument("trace", help = "trace file from sensor_trace.Recorder")
+    parser.add_argument("--synth", type = float, metavar = "MINUTES", help = "write a synthetic trace of this length first")
+    parser.add_argument("--seed", type = int, default = 1, help = "seed of the synthetic trace")
+    parser.add_argument("--limit", type = int, default = 600, help = "screen time in seconds")
+    parser.add_argument("--step", type = float, default = 0.01, help = "sensor task period in seconds")
+    args = parser.parse_args(argv)
+    if args.synth:
+        synthesize(args.trace, args.synth, args.seed)
+    report(replay(sensor_trace.load(args.trace), args.limit, args.step))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
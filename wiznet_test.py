@@ -0,0 +1,349 @@
+import time
+import types
+import desktop_hal
+
+#Desktop check of the WIZnet driver on the W5100S model (python wiznet_test.py, or pytest)
+#Socket buffer layouts: invalid sizes are refused, the chip is programmed with the layout
+#and data larger than the default 2 KB goes through one socket in one SEND, across the ring end
+#UDP: datagrams read in pieces on two sockets at once keep their own length and sender
+#DNS cache: answers are kept for their TTL, least recently used out first, stale ones served when DNS fails
+#Streamed writes: only TCP sockets stream, every UDP write is a datagram of its own, one SEND each
+
+hal = desktop_hal.install()
+
+import board
+import busio
+import digitalio
+from adafruit_wiznet5k import adafruit_wiznet5k as wiznet
+from desktop_hal import w5100s
+
+Peer = b"\x0a\x00\x00\x02"
+
+"""
+WIZNET5K on a new W5100S model
+
+:param: list sizes: socket_sizes of the driver. Default: None (2 KB each)
+
+:return: tuple: (WIZNET5K, W5100S model)
+
+"""
+
+def interface (sizes = None) -> tuple:
+    spi = busio.SPI(board.GP18, MOSI = board.GP19, MISO = board.GP16)
+    sleep = time.sleep
+    time.sleep = lambda seconds: None # chip reset delays, nothing to wait for on the model
+    try:
+        eth = wiznet.WIZNET5K(spi, digitalio.DigitalInOut(board.GP17), is_dhcp = False, socket_sizes = sizes)
+    finally:
+        time.sleep = sleep
+    return eth, spi.chip
+
+"""
+Sizes the W5100S cannot take are refused, by the constructor and by set_socket_sizes()
+
+"""
+
+def test_socket_sizes_invalid () -> None:
+    eth, chip = interface()
+    for sizes in ([3], [16], [4, 4, 1], [2] * 5, [(8, 0), (0, 9)], [(2, 2), (8, 1)]):
+        try:
+            eth.set_socket_sizes(sizes)
+            assert False, "{} accepted".format(sizes)
+        except ValueError:
+            pass
+    try:
+        interface([4, 4, 4])
+        assert False, "12 KB accepted"
+    except ValueError:
+        pass
+
+"""
+The chip registers follow the layout, missing sockets get no memory
+
+"""
+
+def test_socket_sizes_layout () -> None:
+    eth, chip = interface([(1, 4), (4, 1), 2])
+    rx = [chip.mem[chip.reg(n, w5100s.Sn_RXBUF_SIZE)] for n in range(w5100s.Sockets)]
+    tx = [chip.mem[chip.reg(n, w5100s.Sn_TXBUF_SIZE)] for n in range(w5100s.Sockets)]
+    assert rx == [1, 4, 2, 0] and tx == [4, 1, 2, 0], (rx, tx)
+    eth, chip = interface()
+    assert [chip.mem[chip.reg(n, w5100s.Sn_TXBUF_SIZE)] for n in range(w5100s.Sockets)] == [2] * 4
+
+"""
+One 8 KB socket: a 6 KB write is one SEND, the next one wraps around the ring end
+
+"""
+
+def test_socket_sizes_large_write () -> None:
+    eth, chip = interface([8])
+    eth.socket_connect(0, Peer, 1883)
+    data = bytes(i * 7 & 0xFF for i in range(6000))
+    for i in range(2):
+        sends = chip.sends
+        assert eth.socket_write(0, data) == len(data)
+        assert chip.sends - sends == 1
+    assert chip.sent[0] == data + data
+    # the default 2 KB socket needs several writes
+    eth, chip = interface()
+    eth.socket_connect(0, Peer, 1883)
+    assert eth.socket_write(0, data) == 2048
+
+"""
+One 8 KB socket: 5 KB received twice, the second time across the ring end
+
+"""
+
+def test_socket_sizes_large_read () -> None:
+    eth, chip = interface([8])
+    eth.socket_connect(0, Peer, 1883)
+    data = bytes(i * 3 & 0xFF for i in range(5000))
+    buf = bytearray(8192)
+    for i in range(2):
+        chip.deliver(0, data)
+        assert eth.socket_recv_into(0, buf) == len(data)
+        assert buf[:len(data)] == data
+
+"""
+Received datagram as the W5100S puts it in the RX buffer: sender IP, port and length, then the data
+
+:param: bytes ip: sender IP
+        int port: sender port
+        bytes data: payload
+
+:return: bytes: header and payload
+
+"""
+
+def datagram (ip: bytes, port: int, data: bytes) -> bytes:
+    return ip + bytes((port >> 8, port & 0xFF, len(data) >> 8, len(data) & 0xFF)) + data
+
+"""
+Two UDP sockets read in turns: every socket keeps its own datagram length and sender
+
+"""
+
+def test_udp_state_per_socket () -> None:
+    eth, chip = interface()
+    for n in (1, 2):
+        eth.socket_connect(n, Peer, 53 if n == 1 else 123, conn_mode = wiznet.SNMR_UDP)
+    ports = [chip.word(chip.reg(n, 0x04)) for n in (1, 2)] # Sn_PORT
+    assert ports[0] != ports[1], ports
+    dns = bytes(range(40))
+    ntp = bytes(range(100, 148))
+    chip.deliver(1, datagram(b"\x0a\x00\x00\x35", 53, dns) + datagram(b"\x0a\x00\x00\x35", 53, b"next"))
+    chip.deliver(2, datagram(b"\x0a\x00\x00\x7b", 123, ntp))
+
+    assert eth.socket_available(1, wiznet.SNMR_UDP) == 40
+    assert eth.read_udp(1, 16) == (16, bytearray(dns[:16]))
+    assert eth.socket_available(2, wiznet.SNMR_UDP) == 48
+    assert eth.udp_remaining() == 48 # the last header read is the one of socket 2
+    assert eth.read_udp(2, 20) == (20, bytearray(ntp[:20]))
+    assert eth.udp_remaining(1) == 24 and eth.udp_remaining(2) == 28
+    assert eth.udp_remote(1) == ("10.0.0.53", 53)
+    assert eth.udp_remote(2) == ("10.0.0.123", 123)
+    # the rest of each datagram, never more
+    assert eth.read_udp(1, 100) == (24, bytearray(dns[16:]))
+    assert eth.read_udp(2, 100) == (28, bytearray(ntp[20:]))
+    assert eth.read_udp(2, 100) == -1
+    # the next datagram of socket 1 starts at its own header
+    assert eth.socket_available(1, wiznet.SNMR_UDP) == 4
+    assert eth.read_udp(1, 100) == (4, bytearray(b"next"))
+    # opening a socket again forgets a datagram left half read
+    chip.deliver(2, datagram(b"\x0a\x00\x00\x7b", 123, ntp))
+    assert eth.socket_available(2, wiznet.SNMR_UDP) == 48
+    eth.socket_close(2)
+    eth.socket_open(2, wiznet.SNMR_UDP)
+    assert eth.udp_remaining(2) == 0
+
+class Resolver:
+
+    """
+    Stand-in for the compiled DNS client: answers from a table, with the response kept in _pkt_buf
+    The driver makes one per query, the queries are counted on the class
+
+
+    :param: iface / server: interface and DNS server (unused)
+
+    """
+
+    answers = {} # hostname: (ip, ttl), a hostname left out fails
+    down = False # the server does not answer: raise like a timed out client
+    queries = 0
+
+    def __init__ (self, iface, server, debug = False) -> None:
+        self._pkt_buf = None
+
+    def gethostbyname (self, hostname: bytes):
+        Resolver.queries += 1
+        if Resolver.down:
+            raise RuntimeError("DNS timed out")
+        if hostname not in Resolver.answers:
+            return -1
+        ip, ttl = Resolver.answers[hostname]
+        name = b"".join(bytes((len(label),)) + label for label in hostname.split(b".")) + b"\x00"
+        self._pkt_buf = (b"\x12\x34\x81\x80\x00\x01\x00\x01\x00\x00\x00\x00" + name + b"\x00\x01\x00\x01" +
+                         b"\xc0\x0c\x00\x01\x00\x01" + ttl.to_bytes(4, "big") + b"\x00\x04" + ip)
+        return bytearray(ip)
+
+"""
+Run a check with the Resolver as the driver's DNS client and a clock the check moves
+
+:param: callable check: called with (WIZNET5K, clock), clock.now is the time in seconds
+
+"""
+
+def with_resolver (check) -> None:
+    clock = types.SimpleNamespace(now = 1000.0)
+    clock.monotonic = lambda: clock.now
+    clock.sleep = lambda seconds: None
+    Resolver.answers = {}
+    Resolver.down = False
+    Resolver.queries = 0
+    eth, chip = interface()
+    dns, now = wiznet.dns, wiznet.time
+    wiznet.dns = types.SimpleNamespace(DNS = Resolver)
+    wiznet.time = clock
+    try:
+        check(eth, clock)
+    finally:
+        wiznet.dns, wiznet.time = dns, now
+
+"""
+An answer is reused until its TTL runs out, the TTL is capped at DNS_TTL_MAX
+
+"""
+
+def test_dns_cache_ttl () -> None:
+    def check (eth, clock):
+        Resolver.answers = {b"io.adafruit.com": (b"\x34\x36\x10\x01", 60),
+                            b"pool.ntp.org": (b"\x0a\x00\x00\x7b", 10 * wiznet.DNS_TTL_MAX)}
+        ip = eth.get_host_by_name("io.adafruit.com")
+        assert ip == b"\x34\x36\x10\x01" and Resolver.queries == 1
+        clock.now += 59
+        assert eth.get_host_by_name("io.adafruit.com") == ip and Resolver.queries == 1
+        clock.now += 1
+        Resolver.answers[b"io.adafruit.com"] = (b"\x34\x36\x10\x02", 60)
+        assert eth.get_host_by_name("io.adafruit.com") == b"\x34\x36\x10\x02" and Resolver.queries == 2
+        assert (eth.dns_hits, eth.dns_misses) == (1, 2)
+        eth.get_host_by_name("pool.ntp.org")
+        clock.now += wiznet.DNS_TTL_MAX - 1
+        eth.get_host_by_name("pool.ntp.org")
+        assert Resolver.queries == 3
+        clock.now += 1
+        eth.get_host_by_name("pool.ntp.org")
+        assert Resolver.queries == 4
+
+    with_resolver(check)
+
+"""
+A full cache drops the least recently used hostname
+
+"""
+
+def test_dns_cache_lru () -> None:
+    def check (eth, clock):
+        eth.dns_cache_size = 2
+        for name in (b"a.test", b"b.test", b"c.test"):
+            Resolver.answers[name] = (b"\x0a\x00\x00" + name[:1], 300)
+        eth.get_host_by_name("a.test")
+        eth.get_host_by_name("b.test")
+        eth.get_host_by_name("a.test") # a is now the most recently used
+        eth.get_host_by_name("c.test") # b goes
+        assert Resolver.queries == 3
+        eth.get_host_by_name("a.test")
+        assert Resolver.queries == 3
+        eth.get_host_by_name("b.test")
+        assert Resolver.queries == 4
+        assert (eth.dns_hits, eth.dns_misses) == (2, 4)
+
+    with_resolver(check)
+
+"""
+When the DNS server fails an expired answer is still used, unless dns_serve_stale is off
+
+"""
+
+def test_dns_cache_serve_stale () -> None:
+    def check (eth, clock):
+        Resolver.answers = {b"io.adafruit.com": (b"\x34\x36\x10\x01", 60)}
+        eth.get_host_by_name("io.adafruit.com")
+        clock.now += 120
+        Resolver.down = True
+        assert eth.get_host_by_name("io.adafruit.com") == b"\x34\x36\x10\x01"
+        Resolver.down = False
+        Resolver.answers = {}
+        assert eth.get_host_by_name("io.adafruit.com") == b"\x34\x36\x10\x01" # no answer (-1)
+        # an unknown hostname has nothing to fall back on
+        Resolver.down = True
+        try:
+            eth.get_host_by_name("unknown.test")
+            assert False, "unknown hostname resolved"
+        except RuntimeError:
+            pass
+        eth.dns_serve_stale = False
+        try:
+            eth.get_host_by_name("io.adafruit.com")
+            assert False, "stale answer served"
+        except RuntimeError:
+            pass
+
+    with_resolver(check)
+
+"""
+UDP writes are never merged: streaming is refused on a UDP socket and a reopened socket stops streaming
+
+"""
+
+def test_udp_no_stream () -> None:
+    eth, chip = interface()
+    chip.send_delay = 0.002 # SENDs in flight while the next write comes
+    eth.socket_connect(0, Peer, 1883)
+    eth.socket_set_stream(0)
+    eth.socket_connect(1, Peer, 123, conn_mode = wiznet.SNMR_UDP)
+    try:
+        eth.socket_set_stream(1)
+        assert False, "UDP socket streams"
+    except ValueError:
+        pass
+    # the MQTT socket number used again for NTP after a reconnect
+    eth.socket_close(0)
+    eth.socket_connect(0, Peer, 123, conn_mode = wiznet.SNMR_UDP)
+    for n in (0, 1):
+        sends = chip.sends
+        for data in (b"AAAA", b"BBBB", b"CCCC"):
+            assert eth.socket_write(n, data) == 4
+        assert chip.sends - sends == 3, "{} SEND for 3 datagrams".format(chip.sends - sends)
+        assert chip.sent[n][-12:] == b"AAAABBBBCCCC"
+
+"""
+A streaming TCP socket still sends every byte, in order, with fewer SENDs than writes
+
+"""
+
+def test_tcp_stream () -> None:
+    eth, chip = interface()
+    chip.send_delay = 0.002
+    eth.socket_connect(0, Peer, 1883)
+    eth.socket_set_stream(0)
+    data = b""
+    for i in range(30):
+        packet = bytes((i,)) * (i + 1)
+        assert eth.socket_write(0, packet) == len(packet)
+        data += packet
+    assert eth.socket_flush(0)
+    assert chip.sent[0] == data
+    assert chip.sends < 30
+
+if __name__ == "__main__":
+    test_socket_sizes_invalid()
+    test_socket_sizes_layout()
+    test_socket_sizes_large_write()
+    test_socket_sizes_large_read()
+    test_udp_state_per_socket()
+    test_dns_cache_ttl()
+    test_dns_cache_lru()
+    test_dns_cache_serve_stale()
+    test_udp_no_stream()
+    test_tcp_stream()
+    print("OK")